@@ -0,0 +1,130 @@
+import os  # Import for the default rules path
+import json  # Import to load rules from the config file
+import time  # Import for cooldown timestamps
+
+import numpy as np  # Import NumPy to evaluate every rule at once
+
+"""
+Alert Engine
+
+Evaluates many alert rules over many assets in one vectorized pass per tick.
+
+Each rule in the config file looks like:
+    {"asset": "ethereum", "name": "Ethereum", "metric": "change_24hr", "op": "abs_above",
+     "threshold": 10, "hysteresis": 1, "cooldown": 1800}
+
+- metric: "price", "change_24hr" or "change_7d" (any numeric Quote field works).
+- op: "above" (value >= threshold), "below" (value <= threshold), "abs_above" (|value| >= threshold,
+  for percentage moves in either direction) or "cross" (value crosses the threshold level in either direction).
+- hysteresis: how far the value must move back past the threshold before the rule can fire again.
+- cooldown: minimum number of seconds between two firings of the same rule.
+
+Rules are edge-triggered: they fire once when the condition becomes true, not on every tick it stays true.
+"""
+
+# Default alert rules config
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json")
+
+# Operator codes used in the rule arrays
+OPS = {"above": 0, "below": 1, "abs_above": 2, "cross": 3}
+# Defaults for optional rule fields
+DEFAULT_HYSTERESIS = 0.0
+DEFAULT_COOLDOWN = 0.0
+
+
+def load_rules(path):
+    """
+    Load alert rules from a JSON config file.
+    :param path: Path of a JSON file containing {"rules": [...]}.
+    :return: List of rule dictionaries.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["rules"]
+
+
+class AlertEngine:
+    def __init__(self, rules):
+        """
+        :param rules: List of rule dictionaries (see the module docstring).
+        """
+        self.rules = rules
+        # Every distinct asset and metric the rules refer to
+        self.assets = sorted({rule["asset"] for rule in rules})
+        self.metrics = sorted({rule["metric"] for rule in rules})
+        asset_index = {asset: i for i, asset in enumerate(self.assets)}
+        metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+        # One array entry per rule
+        self.rule_asset = np.array([asset_index[rule["asset"]] for rule in rules], dtype=np.intp)
+        self.rule_metric = np.array([metric_index[rule["metric"]] for rule in rules], dtype=np.intp)
+        self.op = np.array([OPS[rule["op"]] for rule in rules], dtype=np.int8)
+        self.threshold = np.array([rule["threshold"] for rule in rules], dtype=np.float64)
+        self.hysteresis = np.array([rule.get("hysteresis", DEFAULT_HYSTERESIS) for rule in rules], dtype=np.float64)
+        self.cooldown = np.array([rule.get("cooldown", DEFAULT_COOLDOWN) for rule in rules], dtype=np.float64)
+
+        # Precomputed masks for each operator
+        self.is_above = self.op == OPS["above"]
+        self.is_below = self.op == OPS["below"]
+        self.is_abs = self.op == OPS["abs_above"]
+        self.is_cross = self.op == OPS["cross"]
+
+        # Per-rule state
+        self.armed = np.ones(len(rules), dtype=bool)  # False after firing until the value moves back
+        self.last_fired = np.full(len(rules), -np.inf)
+        self.side = np.zeros(len(rules), dtype=np.int8)  # Last side of the level for "cross" rules (0 = unknown)
+
+        self._positions_key = None
+        self._positions = None
+
+    def evaluate(self, symbols, arrays, now=None):
+        """
+        Evaluate every rule against a snapshot.
+        :param symbols: List of asset symbols in the snapshot (see quotes.snapshot_arrays).
+        :param arrays: Dictionary mapping metric name to a NumPy array aligned with symbols.
+        :param now: Current time in seconds (defaults to time.time()).
+        :return: List of (rule, value) pairs for the rules that fired on this tick.
+        """
+        now = time.time() if now is None else now
+        values = self._rule_values(symbols, arrays)
+
+        # Conditions for the level-based operators
+        magnitude = np.where(self.is_abs, np.abs(values), values)
+        upper = self.threshold + self.hysteresis
+        lower = self.threshold - self.hysteresis
+        with np.errstate(invalid="ignore"):
+            condition = np.where(self.is_below, magnitude <= self.threshold, magnitude >= self.threshold)
+            # Re-arm once the value has moved back past the threshold by the hysteresis margin
+            rearm = np.where(self.is_below, magnitude > upper, magnitude < lower)
+
+            # Side of the level for "cross" rules; values inside the hysteresis band keep the previous side
+            new_side = np.where(values >= upper, 1, np.where(values <= lower, -1, 0)).astype(np.int8)
+        crossed = self.is_cross & (new_side != 0) & (self.side != 0) & (new_side != self.side)
+        self.side = np.where(self.is_cross & (new_side != 0), new_side, self.side)
+
+        cooled = (now - self.last_fired) >= self.cooldown
+        level_fire = ~self.is_cross & self.armed & condition
+        fire = (level_fire | crossed) & cooled
+
+        # Update state: fired rules disarm, rules whose value moved back re-arm
+        self.armed = (self.armed & ~level_fire) | rearm
+        self.last_fired = np.where(fire, now, self.last_fired)
+
+        return [(self.rules[i], float(values[i])) for i in np.flatnonzero(fire)]
+
+    def _rule_values(self, symbols, arrays):
+        """
+        Gather the current value each rule watches (NaN if the asset or metric is missing).
+        """
+        # The symbol order rarely changes between ticks, so the lookup is cached
+        key = tuple(symbols)
+        if key != self._positions_key:
+            position = {symbol: i for i, symbol in enumerate(symbols)}
+            self._positions = np.array([position.get(asset, len(symbols)) for asset in self.assets], dtype=np.intp)
+            self._positions_key = key
+
+        # Matrix of metrics x assets, with an extra NaN column for assets missing from the snapshot
+        matrix = np.full((len(self.metrics), len(symbols) + 1), np.nan)
+        for i, metric in enumerate(self.metrics):
+            if metric in arrays:
+                matrix[i, :-1] = arrays[metric]
+        return matrix[self.rule_metric, self._positions[self.rule_asset]]
@@ -0,0 +1,208 @@
+import threading  # Import to guard the shared indicator registry
+
+import numpy as np  # Import NumPy for vectorized series maths
+
+"""
+Analytics
+
+Series tools shared by the charts and the dashboard:
+- Downsampling that keeps the visual shape of long series (LTTB, or min/max per bucket) so a chart
+  never draws many more points than it has pixels.
+- IndicatorState: moving averages, rolling volatility and drawdown, updated incrementally.
+  Each update processes only the points newer than the last one seen, reusing a short tail of history.
+- indicators_for(): one IndicatorState per stored series, kept up to date from the time-series store.
+"""
+
+# Default moving-average windows, in points
+DEFAULT_MA_WINDOWS = (20, 50)
+# Default number of returns used for rolling volatility
+DEFAULT_VOL_WINDOW = 20
+
+
+def minmax_indices(y, n_out):
+    """
+    Pick the minimum and maximum point of each bucket, preserving spikes.
+    :param y: Series values.
+    :param n_out: Approximate number of points to keep (two per bucket).
+    :return: Sorted array of indices to keep.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 2:
+        return np.arange(n)
+    buckets = n_out // 2
+    size = -(-n // buckets)  # Ceiling division
+    # Pad to a whole number of buckets so all buckets are processed in one reshape
+    highs = np.full(buckets * size, -np.inf)
+    lows = np.full(buckets * size, np.inf)
+    highs[:n] = y
+    lows[:n] = y
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate([
+        offsets + highs.reshape(buckets, size).argmax(axis=1),
+        offsets + lows.reshape(buckets, size).argmin(axis=1),
+        [0, n - 1],
+    ])
+    return np.unique(keep[keep < n])
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    :param x: Series x values (e.g. timestamps), ascending.
+    :param y: Series values.
+    :param n_out: Number of points to keep (at least 3).
+    :return: Sorted array of indices to keep.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges for the points between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle corner
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Pick the point in this bucket forming the largest triangle
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+    return keep
+
+
+def downsample(x, y, n_out, method="lttb"):
+    """
+    Reduce a series to about n_out points while keeping its visual shape.
+    :param x: Series x values, ascending.
+    :param y: Series values.
+    :param n_out: Target number of points (e.g. the plot width in pixels).
+    :param method: "lttb" or "minmax".
+    :return: Sorted array of indices to keep, so other aligned series can be reduced the same way.
+    """
+    if method == "minmax":
+        return minmax_indices(np.asarray(y, dtype=np.float64), n_out)
+    return lttb_indices(x, y, n_out)
+
+
+class IndicatorState:
+    def __init__(self, ma_windows=DEFAULT_MA_WINDOWS, vol_window=DEFAULT_VOL_WINDOW):
+        """
+        :param ma_windows: Moving-average window lengths, in points.
+        :param vol_window: Number of log returns used for rolling volatility.
+        """
+        self.ma_windows = tuple(ma_windows)
+        self.vol_window = vol_window
+        # Enough history to compute every indicator for the next new point
+        self.tail_length = max(max(self.ma_windows, default=1), vol_window + 1)
+        self.tail = np.empty(0)
+        self.peak = -np.inf
+        self.last_ts = None
+
+        # Full indicator history, aligned with timestamps
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.prices = np.empty(0)
+        self.ma = {window: np.empty(0) for window in self.ma_windows}
+        self.volatility = np.empty(0)  # Standard deviation of log returns
+        self.drawdown = np.empty(0)  # Fraction below the running peak (0 at a new high)
+
+    def update(self, timestamps, prices):
+        """
+        Add new points and compute their indicators; points not newer than the last one are ignored.
+        :param timestamps: Timestamps in milliseconds, ascending.
+        :param prices: Prices aligned with timestamps.
+        :return: Number of new points processed.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.last_ts is not None:
+            new = timestamps > self.last_ts
+            timestamps, prices = timestamps[new], prices[new]
+        if len(prices) == 0:
+            return 0
+
+        # Work on the new points plus just enough history for the longest window
+        window = np.concatenate([self.tail, prices])
+        offset = len(self.tail)
+        count = len(window)
+        sums = np.concatenate([[0.0], np.cumsum(window)])
+
+        for length in self.ma_windows:
+            values = np.full(count, np.nan)
+            if count >= length:
+                values[length - 1:] = (sums[length:] - sums[:-length]) / length
+            self.ma[length] = np.concatenate([self.ma[length], values[offset:]])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(window))  # returns[j] is the return into window[j + 1]
+        volatility = np.full(count, np.nan)
+        length = self.vol_window
+        if len(returns) >= length and length > 1:
+            r_sums = np.concatenate([[0.0], np.cumsum(returns)])
+            r_squares = np.concatenate([[0.0], np.cumsum(returns ** 2)])
+            total = r_sums[length:] - r_sums[:-length]
+            squares = r_squares[length:] - r_squares[:-length]
+            variance = (squares - total ** 2 / length) / (length - 1)
+            volatility[length:] = np.sqrt(np.clip(variance, 0, None))
+        self.volatility = np.concatenate([self.volatility, volatility[offset:]])
+
+        peaks = np.maximum.accumulate(np.concatenate([[self.peak], prices]))[1:]
+        self.peak = peaks[-1]
+        self.drawdown = np.concatenate([self.drawdown, prices / peaks - 1])
+
+        self.timestamps = np.concatenate([self.timestamps, timestamps])
+        self.prices = np.concatenate([self.prices, prices])
+        self.tail = window[-self.tail_length:]
+        self.last_ts = int(timestamps[-1])
+        return len(prices)
+
+    def latest(self):
+        """
+        Get the most recent value of every indicator.
+        :return: Dictionary with "ma_<window>", "volatility" and "drawdown" (NaN if not available yet).
+        """
+        if len(self.prices) == 0:
+            values = {f"ma_{window}": np.nan for window in self.ma_windows}
+            values.update(volatility=np.nan, drawdown=np.nan)
+            return values
+        values = {f"ma_{window}": float(self.ma[window][-1]) for window in self.ma_windows}
+        values.update(volatility=float(self.volatility[-1]), drawdown=float(self.drawdown[-1]))
+        return values
+
+
+_states = {}  # (coin_id, currency) -> (IndicatorState, start of the stored range it was built from)
+_states_lock = threading.Lock()
+
+
+def indicators_for(store, coin_id, currency="gbp"):
+    """
+    Get the indicators of a stored series, reading only points added since the last call.
+    If older history has been backfilled since the state was built, it is rebuilt from the start.
+    :param store: TimeSeriesStore holding the series.
+    :param coin_id: CoinGecko coin ID.
+    :param currency: Currency code (e.g. "gbp").
+    :return: Up-to-date IndicatorState for the series.
+    """
+    coverage = store.coverage(coin_id, currency)
+    covered_from = coverage[0] if coverage else None
+    with _states_lock:
+        state, built_from = _states.get((coin_id, currency), (None, None))
+        if state is None or (covered_from is not None and (built_from is None or covered_from < built_from)):
+            # Every indicator depends on the points before it, so a longer history means starting again
+            state = IndicatorState()
+            _states[(coin_id, currency)] = (state, covered_from)
+    start = None if state.last_ts is None else state.last_ts + 1
+    points = store.query(coin_id, currency, start)
+    if points:
+        timestamps, prices = zip(*points)
+        state.update(timestamps, prices)
+    return state
@@ -0,0 +1,35 @@
+import os  # Import for file replacement and cleanup
+import tempfile  # Import for the temporary file next to the target
+from contextlib import contextmanager  # Import for the atomic_write context manager
+
+"""
+Atomic File Writes
+
+Every file other processes may read while it is being rewritten (cache entries, recordings, snapshots,
+the metrics file and the image manifest) is written to a temporary file in the same folder and then
+moved over the target in one step:
+    with atomic_write(path) as file:
+        json.dump(value, file)
+If the block fails, the temporary file is deleted and the target is left as it was.
+"""
+
+
+@contextmanager
+def atomic_write(path, binary=False):
+    """
+    Write a file atomically, so a reader never sees a partial file.
+    :param path: File to write.
+    :param binary: Open the file in binary mode instead of UTF-8 text.
+    :return: Context manager yielding the open temporary file; it replaces path when the block finishes.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8") as file:
+            yield file
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass  # Already gone; the original error matters more
+        raise
@@ -0,0 +1,305 @@
+import os  # Import for paths and the DISPLAY variable
+import sys  # Import to make the project modules importable
+import json  # Import to write results and read the baseline
+import time  # Import for timing
+import shutil  # Import to find Xvfb
+import argparse  # Import for command-line options
+import platform  # Import to describe the machine in the results
+import tempfile  # Import for the fixture folder
+import statistics  # Import to summarise repeated runs
+import subprocess  # Import to start a headless X server
+
+# Make the project modules importable when run as benchmarks/run_benchmarks.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+"""
+Benchmark Suite
+
+Measures the hot paths against offline fixtures at several watchlist sizes:
+- fetch_prices_e2e: end-to-end concurrent fetch of crypto and stock sources (replayed from disk).
+- crypto_parse_format: parse a CoinGecko response into Quotes and format every quote for display.
+- stock_fetch: fetch_stock_prices from replayed quotes (results include time per ticker).
+- alert_eval: one AlertEngine tick with four rules per asset.
+- gui_display_assets / gui_apply_prices: CryptoDashboard filter redraw and price refresh
+  (needs a display; Xvfb is started automatically when available, otherwise these are skipped).
+
+Results are written as JSON and compared against a stored baseline; the script exits with
+status 1 if any benchmark's median is slower than the baseline by more than the tolerance, or if a
+benchmark in the baseline that this run was asked to measure produced no result (e.g. the GUI
+benchmarks without a display). Sizes left out of --sizes and GUI benchmarks skipped with --skip-gui
+do not count as missing.
+Record the baseline on a machine with a display or Xvfb so it includes the GUI benchmarks.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench_results.json
+    python benchmarks/run_benchmarks.py --save-baseline
+"""
+
+DEFAULT_SIZES = [10, 100, 1000]
+DEFAULT_REPEAT = 7
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown before a benchmark counts as a regression
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+GUI_BENCHMARKS = ("gui_display_assets", "gui_apply_prices")  # Benchmarks left out by --skip-gui
+
+
+def make_watchlist(size):
+    """
+    Build a synthetic watchlist.
+    :return: Tuple of (coins dictionary {id: name}, stocks dictionary {name: ticker}).
+    """
+    coins = {f"coin-{i}": f"Coin {i}" for i in range(size)}
+    stocks = {f"Stock {i}": f"TCK{i}" for i in range(size)}
+    return coins, stocks
+
+
+def time_call(func, repeat, setup=None):
+    """
+    Time a function several times.
+    :param func: Zero-argument function to time.
+    :param repeat: Number of timed runs.
+    :param setup: Optional function run (untimed) before each run.
+    :return: Dictionary of median, min and mean in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "mean_ms": statistics.mean(samples)}
+
+
+def record_fixtures(directory, sizes):
+    """
+    Record synthetic responses for every size so the benchmarks replay them from disk.
+    """
+    import fetch_prices
+    import providers
+
+    providers.set_provider(providers.RecordingProvider(directory, providers.SyntheticProvider()))
+    # The default watchlist is fetched by the dashboard when it starts
+    fetch_prices.fetch_crypto_prices()
+    fetch_prices.fetch_stock_prices()
+    for size in sizes:
+        coins, stocks = make_watchlist(size)
+        fetch_prices.quote_cache.clear()
+        fetch_prices.fetch_crypto_prices(coins)
+        fetch_prices.fetch_stock_prices(stocks)
+    providers.set_provider(providers.ReplayProvider(directory))
+
+
+def bench_fetch(sizes, repeat, results):
+    import fetch_prices
+    import quotes
+
+    cache = fetch_prices.quote_cache
+    for size in sizes:
+        coins, stocks = make_watchlist(size)
+        results[f"fetch_prices_e2e[{size}]"] = time_call(
+            lambda: fetch_prices.fetch_prices(coins, stocks), repeat, setup=cache.clear
+        )
+
+        def parse_and_format():
+            for quote in fetch_prices.fetch_crypto_prices(coins).values():
+                quotes.format_price(quote.price, quote.currency)
+                quotes.format_percent(quote.change_24hr)
+
+        timing = time_call(parse_and_format, repeat, setup=cache.clear)
+        timing["per_asset_us"] = timing["median_ms"] * 1000 / size
+        results[f"crypto_parse_format[{size}]"] = timing
+
+        timing = time_call(lambda: fetch_prices.fetch_stock_prices(stocks), repeat)
+        timing["per_ticker_us"] = timing["median_ms"] * 1000 / size
+        results[f"stock_fetch[{size}]"] = timing
+
+
+def bench_alerts(sizes, repeat, results):
+    import numpy as np
+    from alert_engine import AlertEngine
+
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        symbols = [f"coin-{i}" for i in range(size)]
+        rules = []
+        for symbol in symbols:
+            rules.append({"asset": symbol, "metric": "change_24hr", "op": "abs_above", "threshold": 10, "hysteresis": 1})
+            rules.append({"asset": symbol, "metric": "price", "op": "above", "threshold": 100, "cooldown": 600})
+            rules.append({"asset": symbol, "metric": "price", "op": "below", "threshold": 10, "cooldown": 600})
+            rules.append({"asset": symbol, "metric": "price", "op": "cross", "threshold": 50, "hysteresis": 0.5})
+        engine = AlertEngine(rules)
+        arrays = {
+            "price": rng.uniform(1, 200, size),
+            "change_24hr": rng.normal(0, 8, size),
+            "change_7d": rng.normal(0, 15, size),
+        }
+        engine.evaluate(symbols, arrays)  # Warm up the symbol lookup cache
+        results[f"alert_eval[{size}]"] = time_call(lambda: engine.evaluate(symbols, arrays), repeat)
+
+
+def ensure_display():
+    """
+    Make sure Tk can open a window, starting Xvfb if needed.
+    :return: Tuple of (True if a display is available, Xvfb process or None).
+    """
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return True, None
+    if not shutil.which("Xvfb"):
+        return False, None
+    display = ":99"
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"], stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)  # Give the server a moment to start
+    return True, process
+
+
+def bench_gui(sizes, repeat, results):
+    import tkinter as tk
+    import fetch_prices
+    import gui_display
+
+    class BenchDashboard(gui_display.CryptoDashboard):
+        """Dashboard without its own fetch loop, so nothing but the timed calls touches it."""
+
+        def update_prices(self):
+            pass
+
+    root = tk.Tk()
+    app = BenchDashboard(root)
+    try:
+        for size in sizes:
+            coins, stocks = make_watchlist(size)
+            snapshot = {**fetch_prices.fetch_crypto_prices(coins), **fetch_prices.fetch_stock_prices(stocks)}
+            app.assets = [{"name": name, "type": "crypto"} for name in coins.values()]
+            app.assets += [{"name": name, "type": "stock"} for name in stocks]
+
+            filters = ["crypto", "stock"]
+
+            def display():
+                filters.reverse()  # Alternate between the two filters, like clicking the buttons
+                app.filter_assets(filters[0])
+                root.update_idletasks()
+
+            def apply():
+                app.apply_prices(snapshot)
+                root.update_idletasks()
+
+            app.quotes.clear()
+            results[f"gui_display_assets[{size}]"] = time_call(display, repeat)
+            results[f"gui_apply_prices[{size}]"] = time_call(apply, repeat, setup=app.quotes.clear)
+    finally:
+        root.destroy()
+
+
+def is_requested(name, sizes, skip_gui):
+    """
+    Check whether a benchmark (e.g. "alert_eval[100]") is one this run was asked to measure.
+    :param sizes: Watchlist sizes requested with --sizes.
+    :param skip_gui: True if --skip-gui was given.
+    """
+    benchmark, _, size = name.partition("[")
+    if skip_gui and benchmark in GUI_BENCHMARKS:
+        return False
+    return not size or size.rstrip("]") in {str(value) for value in sizes}
+
+
+def compare(results, baseline, tolerance, requested=None):
+    """
+    Compare results against a baseline.
+    :param requested: Optional function telling whether a baseline benchmark was meant to run
+                      (see is_requested); by default every baseline benchmark is expected.
+    :return: Tuple of (list of (name, baseline median, current median) for benchmarks that regressed,
+             list of expected baseline benchmarks with no result in this run).
+    """
+    regressions = []
+    for name, timing in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference and timing["median_ms"] > reference["median_ms"] * (1 + tolerance):
+            regressions.append((name, reference["median_ms"], timing["median_ms"]))
+    # A benchmark that should have run but did not cannot be shown not to have regressed
+    missing = sorted(
+        name for name in baseline.get("results", {})
+        if name not in results and (requested is None or requested(name))
+    )
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetch, parse, alert and GUI hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Watchlist sizes to test")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="File the results are written to")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--skip-gui", action="store_true", help="Skip the Tk benchmarks")
+    args = parser.parse_args()
+
+    results = {}
+    skipped = []
+    with tempfile.TemporaryDirectory() as fixtures:
+        # Keep the user's cache, saved snapshot, price history, request budget and metrics file out of the
+        # run (set before the project modules are imported, since they read these settings on import)
+        os.environ["FETCH_CACHE_DIR"] = ""
+        os.environ["FETCH_BUDGET_FILE"] = ""
+        os.environ["DASHBOARD_SNAPSHOT"] = os.path.join(fixtures, "dashboard_snapshot.bin")
+        os.environ["FETCH_TIMESERIES_DB"] = os.path.join(fixtures, "timeseries.db")
+        os.environ.pop("METRICS_FILE", None)
+        record_fixtures(fixtures, args.sizes)
+        bench_fetch(args.sizes, args.repeat, results)
+        bench_alerts(args.sizes, args.repeat, results)
+
+        xvfb = None
+        if args.skip_gui:
+            skipped.append("gui")
+        else:
+            has_display, xvfb = ensure_display()
+            if has_display:
+                bench_gui(args.sizes, args.repeat, results)
+            else:
+                skipped.append("gui (no display and Xvfb not found)")
+        if xvfb is not None:
+            xvfb.terminate()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "skipped": skipped,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for name, timing in results.items():
+        print(f"{name:32} {timing['median_ms']:10.3f} ms")
+    for name in skipped:
+        print(f"Skipped: {name}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions, missing = compare(
+        results, baseline, args.tolerance, lambda name: is_requested(name, args.sizes, args.skip_gui)
+    )
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms")
+    for name in missing:
+        print(f"MISSING {name}: in the baseline but not measured in this run")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
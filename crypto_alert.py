@@ -1,44 +1,122 @@
+import sys
 import requests
+from dataclasses import replace
+import metrics
+from fetch_prices import fetch_simple_prices, CRYPTO_COINS
+from quotes import NAN, Quote, to_float, snapshot_arrays
+from alert_engine import AlertEngine, load_rules, RULES_PATH  # Alert rules config (see alert_engine.py for the format)
+from poll_scheduler import PollScheduler
+from fx import BASE_CURRENCY, DISPLAY_CURRENCY, PRICE_FIELDS, get_rates, convert_quotes
 import winsound  # For sound alerts on Windows
 import time
 
-def play_alert(coin_name, change):
+# Currency of the thresholds in price rules
+ALERT_CURRENCY = DISPLAY_CURRENCY
+
+def play_alert(message):
     frequency = 1000  # Set Frequency in Hz
     duration = 500  # Set Duration in ms
-    print(f"ALERT: {coin_name} has changed by {change}%!")
+    print(f"ALERT: {message}")
     for _ in range(3):  # Play sound 3 times
         winsound.Beep(frequency, duration)
 
-def fetch_and_check_alerts():
-    coins = {
-        "ethereum": "Ethereum",
-        "litecoin": "Litecoin",
-        "the-sandbox": "Sandbox",
-        "chiliz": "Chiliz",
-        "floki": "Floki"
-    }
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {
-        "ids": ",".join(coins.keys()),
-        "vs_currencies": "gbp",
-        "include_24hr_change": "true"
-    }
+def describe_alert(rule, value):
+    """Build the alert message for a rule that fired."""
+    name = rule.get("name", rule["asset"])
+    if rule["metric"] == "price":
+        return f"{name} price is {value:.2f} ({rule['op']} {rule['threshold']})!"
+    return f"{name} has changed by {value:.2f}% ({rule['metric']})!"
 
+def fetch_and_check_alerts(engine, coin_ids=None, known_quotes=None):
+    """
+    Fetch coin prices and check the alert rules against them.
+    :param engine: AlertEngine holding the rules.
+    :param coin_ids: Optional subset of coins to fetch (defaults to every coin the rules refer to).
+    :param known_quotes: Optional dictionary of earlier quotes, updated in place, so rules on coins
+                         not fetched this time are checked against their last known values.
+    :return: Dictionary of the freshly fetched Quote records keyed by name (empty if the fetch failed).
+    """
+    coin_ids = engine.assets if coin_ids is None else coin_ids
+    quotes = {}
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        for coin_id, coin_name in coins.items():
-            change_24hr = data.get(coin_id, {}).get("gbp_24h_change", 0)
+        with metrics.profile_cycle(), metrics.timer(metrics.CYCLE_SECONDS):
+            # Fetch the coins, chunked and in parallel for long rule sets
+            data = fetch_simple_prices(coin_ids)
 
-            if isinstance(change_24hr, (float, int)) and abs(change_24hr) >= 10:
-                play_alert(coin_name, change_24hr)
+        parse_start = time.perf_counter()
+        quotes = {
+            CRYPTO_COINS.get(coin_id, coin_id): Quote(
+                symbol=coin_id,
+                name=CRYPTO_COINS.get(coin_id, coin_id),
+                kind="crypto",
+                currency=BASE_CURRENCY,
+                price=to_float(data.get(coin_id, {}).get(BASE_CURRENCY)),
+                change_24hr=to_float(data.get(coin_id, {}).get(f"{BASE_CURRENCY}_24h_change")),
+                change_7d=to_float(data.get(coin_id, {}).get(f"{BASE_CURRENCY}_7d_change")),
+            )
+            for coin_id in coin_ids
+        }
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - parse_start, source="alerts")
+        if known_quotes is not None:
+            known_quotes.update(quotes)
+        check_quotes(engine, quotes if known_quotes is None else known_quotes)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+    metrics.cycle_finished()
+    return quotes
 
-if __name__ == "__main__":
+def run_scheduled(engine):
+    """
+    Poll the rules' coins on volatility-adaptive intervals within the shared request budget
+    (see poll_scheduler.py), instead of refreshing everything every five minutes.
+    :param engine: AlertEngine holding the rules.
+    """
+    scheduler = PollScheduler()
+    scheduler.add_assets({coin_id: CRYPTO_COINS.get(coin_id, coin_id) for coin_id in engine.assets})
+    scheduler.set_alert_assets(engine.assets)
+    known_quotes = {}
     while True:
-        fetch_and_check_alerts()
-        time.sleep(300)  # Check every 5 minutes
+        coins, _ = scheduler.select()
+        if coins:
+            scheduler.observe(fetch_and_check_alerts(engine, list(coins), known_quotes))
+        time.sleep(max(1.0, scheduler.next_delay()))
+
+def check_quotes(engine, quotes):
+    """
+    Evaluate the alert rules against a snapshot and sound any alerts that fire.
+    :param engine: AlertEngine holding the rules.
+    :param quotes: Dictionary of Quote records (rules match on Quote.symbol, i.e. the CoinGecko ID).
+    """
+    try:
+        # Price thresholds are in ALERT_CURRENCY; convert the snapshot locally from the cached FX table
+        quotes = convert_quotes(quotes, ALERT_CURRENCY, get_rates())
+    except Exception as e:
+        # Never compare prices with thresholds in another currency: blank them so price rules sit out this
+        # tick (a NaN value neither fires nor changes a rule's state); percentage rules still run
+        print(f"Error converting to {ALERT_CURRENCY}, skipping price rules: {e}")
+        quotes = {name: replace(quote, **{field: NAN for field in PRICE_FIELDS}) for name, quote in quotes.items()}
+    # Evaluate every rule over every coin at once
+    symbols, arrays = snapshot_arrays(quotes.values())
+    for rule, value in engine.evaluate(symbols, arrays):
+        play_alert(describe_alert(rule, value))
+
+def run_subscriber(engine, address=None):
+    """
+    Check alerts against every snapshot published by the fetch daemon instead of polling the API.
+    :param engine: AlertEngine holding the rules.
+    :param address: Fetch daemon address (see fetch_daemon.py), or None for the default.
+    """
+    from fetch_daemon import subscribe
+
+    for _, quotes in subscribe(address):
+        check_quotes(engine, quotes)
+
+if __name__ == "__main__":
+    metrics.start_exporter()  # Serve metrics or capture a profile if METRICS_PORT or FETCH_PROFILE is set
+    engine = AlertEngine(load_rules(RULES_PATH))
+    if "--subscribe" in sys.argv:
+        # Share the fetch daemon's snapshots instead of polling the API from this process
+        run_subscriber(engine)
+    else:
+        run_scheduled(engine)
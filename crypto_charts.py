@@ -1,41 +1,181 @@
+import os
+import math
+import time
+import argparse
+import multiprocessing
 import requests
+from providers import get_provider
 import matplotlib.pyplot as plt
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from timeseries_store import TimeSeriesStore
+from analytics import downsample, indicators_for
+from watchlist import load_watchlist
+from fx import DISPLAY_CURRENCY, DISPLAY_CURRENCIES
 
-def fetch_historical_data(coin_id):
-    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-    params = {"vs_currency": "gbp", "days": "7", "interval": "daily"}
+# Don't ask the API for new points if the stored series is newer than this (milliseconds)
+REFRESH_AFTER_MS = 5 * 60 * 1000
+# Only draw point markers when a chart has at most this many points
+MARKER_LIMIT = 60
+# Moving average drawn over the price line (points)
+CHART_MA_WINDOW = 20
+
+_store = None
+
+def get_store():
+    """Open the local time-series store on first use."""
+    global _store
+    if _store is None:
+        _store = TimeSeriesStore()
+    return _store
+
+def fetch_range(coin_id, currency, start_ms, end_ms):
+    """Download the price points of one coin between two timestamps (milliseconds)."""
+    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart/range"
+    params = {"vs_currency": currency, "from": start_ms // 1000, "to": end_ms // 1000}
+    data = get_provider().get_json(url, params=params, timeout=10)
+    return data.get("prices", [])
+
+def sync_historical_data(coin_id, currency, start_ms, now_ms):
+    """Download only the parts of the requested window that are not stored yet."""
+    store = get_store()
+    coverage = store.coverage(coin_id, currency)
+    if coverage is None or start_ms < coverage[0]:
+        # Backfill everything older than what we already have
+        end_ms = coverage[0] if coverage else now_ms
+        store.append(coin_id, currency, fetch_range(coin_id, currency, start_ms, end_ms), start_ms, end_ms)
+    if coverage is not None and now_ms - coverage[1] > REFRESH_AFTER_MS:
+        # Fetch only the points after the last stored timestamp
+        store.append(coin_id, currency, fetch_range(coin_id, currency, coverage[1], now_ms), coverage[1], now_ms)
+
+def load_series(coin_id, days=7, currency=DISPLAY_CURRENCY):
+    """Sync a coin's series and return its (timestamp_ms, price) points for the last `days` days."""
+    now_ms = int(time.time() * 1000)
+    start_ms = now_ms - days * 24 * 60 * 60 * 1000
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        prices = data.get("prices", [])
-        timestamps = [datetime.utcfromtimestamp(price[0] / 1000) for price in prices]
-        values = [price[1] for price in prices]
-        return timestamps, values
+        sync_historical_data(coin_id, currency, start_ms, now_ms)
     except requests.exceptions.RequestException as e:
+        # Fall back to whatever is already stored locally
         print(f"Error fetching historical data: {e}")
-        return [], []
-
-def plot_historical_chart(coin_id, coin_name):
-    timestamps, values = fetch_historical_data(coin_id)
-    if timestamps and values:
-        plt.figure(figsize=(10, 6))
-        plt.plot(timestamps, values, marker="o", linestyle="-", label=coin_name)
-        plt.title(f"{coin_name} Historical Price (7 Days)")
-        plt.xlabel("Date")
-        plt.ylabel("Price (GBP)")
-        plt.grid(True)
-        plt.legend()
-        plt.tight_layout()
+    return get_store().query(coin_id, currency, start_ms, now_ms)
+
+def fetch_historical_data(coin_id, days=7, currency=DISPLAY_CURRENCY):
+    prices = load_series(coin_id, days, currency)
+    timestamps = [datetime.utcfromtimestamp(price[0] / 1000) for price in prices]
+    values = [price[1] for price in prices]
+    return timestamps, values
+
+def chart_series(coin_id, days=7, currency=DISPLAY_CURRENCY):
+    """Sync a coin's series and return its timestamps (ms), prices and moving average for the window.
+
+    History is fetched and stored in `currency` itself, so every point keeps the exchange rate of its own day.
+    """
+    load_series(coin_id, days, currency)
+    # Indicators are updated incrementally from the store, processing only new points
+    state = indicators_for(get_store(), coin_id, currency)
+    window = state.timestamps >= int(time.time() * 1000) - days * 24 * 60 * 60 * 1000
+    return state.timestamps[window], state.prices[window], state.ma[CHART_MA_WINDOW][window]
+
+def draw_series(ax, coin_name, timestamps, prices, moving_average, days, width_px, currency=DISPLAY_CURRENCY):
+    """Plot a series on an axis, downsampled to about one point per pixel."""
+    keep = downsample(timestamps, prices, width_px)
+    dates = [datetime.utcfromtimestamp(ts / 1000) for ts in timestamps[keep]]
+    marker = "o" if len(keep) <= MARKER_LIMIT else None
+    ax.plot(dates, prices[keep], marker=marker, linestyle="-", label=coin_name)
+    ax.plot(dates, moving_average[keep], linestyle="--", label=f"{CHART_MA_WINDOW}-point MA")
+    ax.set_title(f"{coin_name} Historical Price ({days} Days)")
+    ax.set_xlabel("Date")
+    ax.set_ylabel(f"Price ({currency.upper()})")
+    ax.grid(True)
+    ax.legend()
+
+def plot_historical_chart(coin_id, coin_name, days=7, currency=DISPLAY_CURRENCY):
+    timestamps, prices, moving_average = chart_series(coin_id, days, currency)
+    if len(timestamps):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        draw_series(ax, coin_name, timestamps, prices, moving_average, days, int(fig.get_figwidth() * fig.dpi), currency)
+        fig.tight_layout()
         plt.show()
     else:
         print(f"Failed to plot data for {coin_name}.")
 
-# Call this function for each cryptocurrency
+# Figures reused by a batch worker process, keyed by (rows, cols)
+_figures = {}
+
+def _init_render_worker():
+    """Switch a batch worker to the off-screen Agg backend."""
+    plt.switch_backend("Agg")
+
+def _get_figure(rows, cols):
+    """Get this worker's figure for a layout, creating it on first use."""
+    if (rows, cols) not in _figures:
+        fig, axes = plt.subplots(rows, cols, figsize=(10 * cols, 6 * rows), squeeze=False)
+        _figures[(rows, cols)] = (fig, axes.flatten())
+    return _figures[(rows, cols)]
+
+def render_page(panels, path, days, rows, cols, currency=DISPLAY_CURRENCY):
+    """Draw one or more coins' series into a reused figure and save it (runs in a worker process)."""
+    fig, axes = _get_figure(rows, cols)
+    for i, ax in enumerate(axes):
+        ax.clear()
+        if i >= len(panels):
+            ax.set_visible(False)  # Unused panel on the last page
+            continue
+        ax.set_visible(True)
+        coin_name, timestamps, prices, moving_average = panels[i]
+        draw_series(
+            ax, coin_name, timestamps, prices, moving_average, days, int(fig.get_figwidth() * fig.dpi / cols), currency
+        )
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+def render_batch(coins, out_dir="charts", days=7, fmt="png", panels=1, workers=None, currency=DISPLAY_CURRENCY):
+    """Render charts for many coins off-screen in parallel worker processes.
+
+    coins maps CoinGecko IDs to display names; `panels` coins are drawn per image in a grid.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # Load the data here so the store and the API rate limit are shared by one process
+    series = []
+    for coin_id, coin_name in coins.items():
+        timestamps, prices, moving_average = chart_series(coin_id, days, currency)
+        if len(timestamps):
+            series.append((coin_id, coin_name, timestamps, prices, moving_average))
+        else:
+            print(f"Failed to plot data for {coin_name}.")
+
+    cols = math.ceil(math.sqrt(panels))
+    rows = math.ceil(panels / cols)
+    pages = [series[i:i + panels] for i in range(0, len(series), panels)]
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_render_worker
+    ) as executor:
+        futures = []
+        for page in pages:
+            name = page[0][0] if panels == 1 else f"page_{len(futures) + 1}"
+            path = os.path.join(out_dir, f"{name}.{fmt}")
+            futures.append(executor.submit(render_page, [item[1:] for item in page], path, days, rows, cols, currency))
+        for future in futures:
+            print(f"Saved {future.result()}")
+
+# Coins charted when the script is run directly (the "charts" section of watchlist.json)
+COINS = load_watchlist()["charts"]
+
 if __name__ == "__main__":
-    plot_historical_chart("ethereum", "Ethereum")
-    plot_historical_chart("litecoin", "Litecoin")
-    plot_historical_chart("the-sandbox", "Sandbox")
-    plot_historical_chart("chiliz", "Chiliz")
-    plot_historical_chart("floki", "Floki")
+    parser = argparse.ArgumentParser(description="Plot historical crypto prices.")
+    parser.add_argument("--batch", action="store_true", help="Render to files off-screen instead of opening windows")
+    parser.add_argument("--out", default="charts", help="Output folder for --batch")
+    parser.add_argument("--format", default="png", choices=["png", "svg"], help="Image format for --batch")
+    parser.add_argument("--panels", type=int, default=1, help="Charts per image for --batch")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --batch")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to plot")
+    parser.add_argument("--currency", default=DISPLAY_CURRENCY, choices=DISPLAY_CURRENCIES, help="Display currency")
+    args = parser.parse_args()
+
+    if args.batch:
+        render_batch(COINS, args.out, args.days, args.format, args.panels, args.workers, args.currency)
+    else:
+        # Call this function for each cryptocurrency
+        for coin_id, coin_name in COINS.items():
+            plot_historical_chart(coin_id, coin_name, args.days, args.currency)
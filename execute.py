@@ -1,4 +1,6 @@
 import os  # Import for managing file paths
+import sys  # Import for the --daemon option and the current interpreter
+import time  # Import to give the daemon a moment to start
 import subprocess  # Import to run other Python files as separate processes
 
 def run_dashboard():
@@ -15,6 +17,28 @@ def run_dashboard():
         # Print the error message if script execution fails
         print(f"Error executing gui_display.py: {e}")
 
+def run_with_daemon():
+    """
+    Start the fetch daemon and the alerter, then run the dashboard as a subscriber.
+    Only the daemon polls the APIs; the other processes receive its snapshots.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    daemon = subprocess.Popen([sys.executable, os.path.join(directory, "fetch_daemon.py")])
+    time.sleep(1)  # Let the daemon create its socket before subscribers connect
+    alerter = subprocess.Popen([sys.executable, os.path.join(directory, "crypto_alert.py"), "--subscribe"])
+    try:
+        subprocess.run([sys.executable, os.path.join(directory, "gui_display.py"), "--subscribe"], check=True)
+    except Exception as e:
+        print(f"Error executing gui_display.py: {e}")
+    finally:
+        # Stop the background processes when the dashboard is closed
+        alerter.terminate()
+        daemon.terminate()
+
 if __name__ == "__main__":
-    # Run the dashboard
-    run_dashboard()
+    if "--daemon" in sys.argv:
+        # Run one shared fetcher feeding the dashboard and the alerter
+        run_with_daemon()
+    else:
+        # Run the dashboard
+        run_dashboard()
@@ -0,0 +1,230 @@
+import os  # Import for the socket path and the FETCH_DAEMON setting
+import sys  # Import to pick Unix sockets or TCP by platform
+import time  # Import for the refresh loop and snapshot timestamps
+import socket  # Import for the local publish/subscribe socket
+import struct  # Import for the message length prefix
+import argparse  # Import for command-line options
+import tempfile  # Import for the default socket location
+import threading  # Import to accept subscribers while fetching
+
+import metrics  # Import to export fetch metrics from the daemon
+from fetch_prices import fetch_prices, CRYPTO_COINS, STOCKS  # Import the combined fetch and the watchlist
+from poll_scheduler import PollScheduler, REQUEST_BUDGET  # Import the adaptive refresh scheduler
+from quotes import encode_snapshot, decode_snapshot  # Import the binary snapshot format
+
+"""
+Fetch Daemon
+
+Runs a single fetcher that publishes each snapshot once to every local subscriber, so API load
+stays the same however many dashboards and alerters are attached:
+    python fetch_daemon.py                       # Publish snapshots as the poll scheduler refreshes assets
+    python gui_display.py --subscribe            # Dashboard fed by the daemon
+    python crypto_alert.py --subscribe           # Alerter fed by the daemon
+
+Subscribers connect over a Unix domain socket (a localhost TCP port on Windows). The address can be
+set with the FETCH_DAEMON environment variable as "unix:<path>" or "tcp:<host>:<port>".
+
+Each message is a 4-byte length followed by a snapshot in the binary format of quotes.encode_snapshot().
+A new subscriber immediately receives the latest snapshot.
+"""
+
+# Seconds a subscriber may block a send before it is dropped
+SEND_TIMEOUT = 2.0
+
+LENGTH = struct.Struct("<I")  # Length prefix of each message
+
+if sys.platform == "win32":
+    DEFAULT_ADDRESS = "tcp:127.0.0.1:8766"
+else:
+    DEFAULT_ADDRESS = "unix:" + os.path.join(tempfile.gettempdir(), "fetch_daemon.sock")
+
+
+def parse_address(address):
+    """
+    Split an address setting into a socket family and socket address.
+    :param address: "unix:<path>" or "tcp:<host>:<port>".
+    :return: Tuple of (socket family, address for bind/connect).
+    """
+    scheme, _, rest = address.partition(":")
+    if scheme == "unix":
+        return socket.AF_UNIX, rest
+    if scheme == "tcp":
+        host, _, port = rest.rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    raise ValueError(f"Unknown daemon address: {address}")
+
+
+def get_address():
+    """
+    Get the daemon address from FETCH_DAEMON, falling back to the platform default.
+    """
+    return os.environ.get("FETCH_DAEMON") or DEFAULT_ADDRESS
+
+
+def recv_exactly(sock, size):
+    """
+    Read exactly size bytes from a socket.
+    :return: The bytes, or None if the connection closed first.
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+class SnapshotPublisher:
+    def __init__(self, address=None):
+        """
+        :param address: Address to listen on (see parse_address); defaults to get_address().
+        """
+        self.family, self.address = parse_address(address or get_address())
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)  # Left behind by a previous daemon
+        self.server = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.subscribers = []
+        self.latest = None  # Last published message, sent to new subscribers on connect
+        self.lock = threading.Lock()
+        threading.Thread(target=self._accept_loop, name="daemon-accept", daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return  # Server socket closed
+            client.settimeout(SEND_TIMEOUT)  # A stalled subscriber must not hold up the others
+            with self.lock:
+                if self.latest is not None and not self._send(client, self.latest):
+                    continue
+                self.subscribers.append(client)
+
+    def _send(self, client, message):
+        try:
+            client.sendall(message)
+            return True
+        except OSError:
+            client.close()
+            return False
+
+    def publish(self, quotes, timestamp=None):
+        """
+        Send a snapshot to every subscriber, dropping any that have gone away.
+        :param quotes: Dictionary mapping asset name to Quote.
+        :param timestamp: Time the snapshot was taken (defaults to now).
+        :return: Number of subscribers the snapshot reached.
+        """
+        payload = encode_snapshot(quotes, timestamp)
+        message = LENGTH.pack(len(payload)) + payload
+        with self.lock:
+            self.latest = message
+            self.subscribers = [client for client in self.subscribers if self._send(client, message)]
+            return len(self.subscribers)
+
+    def close(self):
+        with self.lock:
+            for client in self.subscribers:
+                client.close()
+            self.subscribers = []
+        self.server.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+def subscribe(address=None, retry_delay=2.0):
+    """
+    Yield snapshots from the daemon as they are published, reconnecting if the connection drops.
+    :param address: Daemon address (see parse_address); defaults to get_address().
+    :param retry_delay: Seconds to wait before reconnecting.
+    :return: Generator of (timestamp, dictionary mapping asset name to Quote).
+    """
+    family, sock_address = parse_address(address or get_address())
+    while True:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(sock_address)
+                while True:
+                    header = recv_exactly(sock, LENGTH.size)
+                    if header is None:
+                        break
+                    payload = recv_exactly(sock, LENGTH.unpack(header)[0])
+                    if payload is None:
+                        break
+                    yield decode_snapshot(payload)
+        except OSError as e:
+            print(f"Waiting for fetch daemon ({e})")
+        time.sleep(retry_delay)
+
+
+def make_scheduler(budget_per_minute=REQUEST_BUDGET, rules_path=None):
+    """
+    Create the daemon's scheduler for the watchlist plus every asset referenced by an alert rule.
+    :param budget_per_minute: Requests per minute shared by every asset.
+    :param rules_path: Alert rules file; defaults to alert_engine.RULES_PATH.
+    :return: A PollScheduler.
+    """
+    from alert_engine import load_rules, RULES_PATH
+
+    scheduler = PollScheduler(budget_per_minute)
+    scheduler.add_assets(CRYPTO_COINS, STOCKS)
+    try:
+        rules = load_rules(rules_path or RULES_PATH)
+        # Alerting subscribers only see what the daemon fetches, so rule assets outside the watchlist are added too
+        scheduler.add_assets({rule["asset"]: rule.get("name", rule["asset"]) for rule in rules}, {})
+        # Coins with alert rules are refreshed sooner for the alerting subscribers
+        scheduler.set_alert_assets(rule["asset"] for rule in rules)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading alert rules: {e}")
+    return scheduler
+
+
+def run_daemon(address=None, budget_per_minute=REQUEST_BUDGET):
+    """
+    Refresh assets as the poll scheduler decides and publish the full, merged snapshot after every refresh.
+    The daemon is the only fetcher, so its budget covers every subscriber.
+    :param address: Address to listen on; defaults to get_address().
+    :param budget_per_minute: Requests per minute shared by every asset.
+    """
+    scheduler = make_scheduler(budget_per_minute)
+    publisher = SnapshotPublisher(address)
+    print(f"Fetch daemon publishing on {address or get_address()}")
+    snapshot = {}
+    try:
+        while True:
+            if refresh(scheduler, snapshot):
+                publisher.publish(snapshot)
+            time.sleep(max(1.0, scheduler.next_delay()))
+    finally:
+        publisher.close()
+
+
+def refresh(scheduler, snapshot):
+    """
+    Fetch whatever the scheduler selects and merge the results into the snapshot.
+    :param scheduler: The daemon's PollScheduler.
+    :param snapshot: Dictionary mapping asset name to Quote, updated in place.
+    :return: The quotes fetched (empty if nothing was due).
+    """
+    coins, stocks = scheduler.select()
+    if not coins and not stocks:
+        return {}
+    quotes = fetch_prices(coins, stocks)
+    scheduler.observe(quotes)
+    snapshot.update(quotes)
+    metrics.cycle_finished()
+    return quotes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch prices once and publish them to local subscribers.")
+    parser.add_argument("--address", default=None, help='Listen address: "unix:<path>" or "tcp:<host>:<port>"')
+    parser.add_argument("--budget", type=float, default=REQUEST_BUDGET, help="Requests per minute for all assets")
+    args = parser.parse_args()
+    metrics.start_exporter()
+    run_daemon(args.address, args.budget)
@@ -1,13 +1,10 @@
-import yfinance as yf  # Import yfinance to fetch stock data
-import requests  # Import requests to fetch cryptocurrency data from CoinGecko
-
 """
 Fetch Prices Script
 
 Current Features:
 1. Cryptocurrency Data:
    - Pulls live prices, 24-hour changes, and 7-day changes for Bitcoin, Ethereum, and Litecoin from the CoinGecko API.
-   - Handles both USD and GBP currencies and formats the data neatly for use.
+   - Fetches prices in one base currency (USD); other currencies are converted locally from a cached FX table (see fx.py).
    - Logs any errors to the console if something goes wrong (e.g., API timeout).
 
 2. Stock Data:
@@ -45,59 +42,106 @@ Future Improvements:
 
 """
 
-import yfinance as yf  # Import yfinance to fetch stock data
-import requests  # Import requests to fetch cryptocurrency data from CoinGecko
+import metrics  # Import to time sources, parsing and whole refresh cycles
+from providers import get_provider  # Import the data provider used for stock quotes
+from quote_cache import quote_cache  # Import the shared cache for CoinGecko responses
+from quotes import Quote, to_float  # Import typed quote records
+from watchlist import load_watchlist, chunk_ids  # Import the configured assets and request chunking
+from fx import BASE_CURRENCY  # Import the single currency prices are fetched in
+import time  # Import time to track per-source deadlines
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # Import for running sources in parallel
+
+# Overall time budget (in seconds) for a single fetch_prices() refresh
+FETCH_BUDGET = 15
+# Individual deadline (in seconds) for each data source, capped by FETCH_BUDGET
+SOURCE_TIMEOUTS = {
+    "crypto": 10,  # One CoinGecko round trip
+    "stocks": 12,  # Yahoo Finance can be slower to respond
+}
+
+# Shared worker pool so every refresh starts all sources at once without paying thread start-up costs
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fetch-source")
+
+# Pool for fetching the chunks of a large CoinGecko request in parallel (separate from _executor,
+# whose workers wait on these chunks)
+_chunk_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch-chunk")
 
-def fetch_crypto_prices():
+# Load the tracked assets from the watchlist config
+_watchlist = load_watchlist()
+# Cryptocurrencies to fetch, as CoinGecko ID -> display name
+CRYPTO_COINS = _watchlist["crypto"]
+# Stocks to fetch, as display name -> Yahoo Finance ticker
+STOCKS = _watchlist["stocks"]
+
+# CoinGecko's simple price API
+SIMPLE_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+def fetch_simple_prices(ids, vs_currencies=BASE_CURRENCY):
     """
-    Fetch the current prices and 24-hour changes for cryptocurrencies from the CoinGecko API.
-    :return: Dictionary containing price and percentage change data for each cryptocurrency.
+    Fetch CoinGecko simple prices for any number of coins.
+    The IDs are split into URL- and API-safe chunks that are fetched in parallel (still within the
+    shared CoinGecko rate limit) and merged, so a long watchlist takes about as long as one request.
+    :param ids: Iterable of CoinGecko IDs.
+    :param vs_currencies: Comma-separated currencies to price the coins in.
+    :return: Merged CoinGecko response mapping coin ID to its prices and changes.
     """
-    # Define the cryptocurrencies to fetch with their CoinGecko IDs
-    coins = {
-        "bitcoin": "Bitcoin",  # Bitcoin (BTC)
-        "ethereum": "Ethereum",  # Ethereum (ETH)
-        "litecoin": "Litecoin",  # Litecoin (LTC)
-        "ripple": "XRP",  # Ripple (XRP)
-        "monero": "Monero",  # Monero (XMR)
-        "cardano": "Cardano",  # Cardano (ADA)
-        "dogecoin": "Dogecoin"  # Dogecoin (DOGE)
-    }
+    def fetch_chunk(chunk):
+        params = {
+            "ids": ",".join(chunk),  # Join cryptocurrency IDs into a comma-separated string
+            "vs_currencies": vs_currencies,
+            "include_24hr_change": "true",  # Include 24-hour percentage changes
+            "include_7d_change": "true"  # Include 7-day percentage changes
+        }
+        # Send a GET request to the CoinGecko API through the shared cache
+        return quote_cache.get_json(SIMPLE_PRICE_URL, params)
 
-    # API endpoint and parameters for CoinGecko's simple price API
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {
-        "ids": ",".join(coins.keys()),  # Join cryptocurrency IDs into a comma-separated string
-        "vs_currencies": "usd,gbp",  # Fetch prices in USD and GBP
-        "include_24hr_change": "true",  # Include 24-hour percentage changes
-        "include_7d_change": "true"  # Include 7-day percentage changes
-    }
+    chunks = chunk_ids(list(ids))
+    if len(chunks) == 1:
+        return fetch_chunk(chunks[0])  # No need for a pool hop
+
+    data = {}
+    errors = []
+    for future in [_chunk_executor.submit(fetch_chunk, chunk) for chunk in chunks]:
+        try:
+            data.update(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        if len(errors) == len(chunks):
+            raise errors[0]  # Nothing came back
+        print(f"Error fetching {len(errors)} of {len(chunks)} cryptocurrency chunks: {errors[0]}")
+    return data
+
+def fetch_crypto_prices(coins=None):
+    """
+    Fetch the current prices and 24-hour changes for cryptocurrencies from the CoinGecko API.
+    :param coins: Optional dictionary mapping CoinGecko IDs to display names (defaults to CRYPTO_COINS).
+    :return: Dictionary mapping each cryptocurrency's name to a Quote (BASE_CURRENCY prices, NaN where missing).
+             Other currencies are converted locally with fx.convert_quotes().
+    """
+    coins = CRYPTO_COINS if coins is None else coins
 
     try:
-        # Send a GET request to the CoinGecko API
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()  # Raise an error if the response status is not 200
-        data = response.json()  # Parse the JSON response
+        # Fetch prices in the base currency only, in parallel chunks for long watchlists
+        data = fetch_simple_prices(coins.keys())
 
+        parse_start = time.perf_counter()
         # Initialize an empty dictionary to store results
         results = {}
         # Loop through each cryptocurrency and extract its data
         for coin_id, coin_name in coins.items():
-            price_gbp = data.get(coin_id, {}).get("gbp", "N/A")  # Get the price in GBP
-            change_24hr = data.get(coin_id, {}).get("gbp_24h_change", "N/A")  # Get the 24-hour change
-            change_7d = data.get(coin_id, {}).get("gbp_7d_change", "N/A")  # Get the 7-day change
-
-            # Format the price and percentage changes if valid, otherwise set as "N/A"
-            price_gbp = f"{price_gbp:.2f}" if isinstance(price_gbp, (float, int)) else "N/A"
-            change_24hr = f"{change_24hr:.2f}%" if isinstance(change_24hr, (float, int)) else "N/A"
-            change_7d = f"{change_7d:.2f}%" if isinstance(change_7d, (float, int)) else "N/A"
-
-            # Add the formatted data to the results dictionary
-            results[coin_name] = {
-                "price": price_gbp,
-                "change_24hr": change_24hr,
-                "change_7d": change_7d
-            }
+            coin_data = data.get(coin_id, {})
+            # Keep the raw numbers (NaN if missing); formatting happens in the display layer
+            results[coin_name] = Quote(
+                symbol=coin_id,
+                name=coin_name,
+                kind="crypto",
+                currency=BASE_CURRENCY,
+                price=to_float(coin_data.get(BASE_CURRENCY)),  # Price in the base currency
+                change_24hr=to_float(coin_data.get(f"{BASE_CURRENCY}_24h_change")),  # 24-hour change
+                change_7d=to_float(coin_data.get(f"{BASE_CURRENCY}_7d_change")),  # 7-day change
+            )
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - parse_start, source="crypto")
 
         return results  # Return the dictionary of results
 
@@ -106,35 +150,33 @@ def fetch_crypto_prices():
         print(f"Error fetching cryptocurrency data: {e}")
         return None  # Return None if an error occurs
 
-def fetch_stock_prices():
+def fetch_stock_prices(stocks=None):
     """
-    Fetch the current prices for stocks using the yfinance library.
-    :return: Dictionary containing the latest prices for each stock.
+    Fetch the current prices for stocks using the yfinance library (through the active data provider).
+    All tickers are requested in one batch; only tickers missing from the batch are fetched individually.
+    :param stocks: Optional dictionary mapping display names to Yahoo Finance tickers (defaults to STOCKS).
+    :return: Dictionary mapping each stock's name to a Quote with the latest price, high, low and volume.
     """
-    # Define the stocks to fetch with their Yahoo Finance tickers
-    stocks = {
-        "S&P 500": "^GSPC",  # S&P 500 index
-        "Tesla": "TSLA",  # Tesla Inc.
-        "Nio": "NIO",  # Nio Inc.
-        "Apple": "AAPL"  # Apple Inc.
-    }
+    stocks = STOCKS if stocks is None else stocks
 
     # Initialize an empty dictionary to store results
     results = {}
     try:
-        # Loop through each stock and fetch its data
+        # Fetch every ticker in a single bulk request
+        quotes = get_provider().get_stock_quotes(list(stocks.values()))
+
+        parse_start = time.perf_counter()
         for stock_name, ticker in stocks.items():
-            stock = yf.Ticker(ticker)  # Create a yfinance Ticker object
-            stock_data = stock.history(period="1d")  # Fetch the latest day's data
-            if not stock_data.empty:  # Check if the data is not empty
-                current_price = stock_data["Close"].iloc[-1]  # Get the latest closing price
-                # Add the price to the results dictionary
-                results[stock_name] = {
-                    "price": f"{current_price:.2f}"
-                }
-            else:
-                # If no data is available, set the price as "N/A"
-                results[stock_name] = {"price": "N/A"}
+            quote = quotes.get(ticker)
+            # Yahoo Finance quotes these tickers in US dollars
+            results[stock_name] = Quote(symbol=ticker, name=stock_name, kind="stock", currency="usd")
+            if quote is not None:
+                # Add the latest values; missing ones stay NaN
+                results[stock_name].price = to_float(quote["Close"])
+                results[stock_name].high = to_float(quote["High"])
+                results[stock_name].low = to_float(quote["Low"])
+                results[stock_name].volume = to_float(quote["Volume"])
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - parse_start, source="stocks")
 
         return results  # Return the dictionary of results
 
@@ -143,16 +185,96 @@ def fetch_stock_prices():
         print(f"Error fetching stock data: {e}")
         return None  # Return None if an error occurs
 
-def fetch_prices():
+def fetch_sources(sources=None, budget=FETCH_BUDGET):
     """
-    Fetch prices for both cryptocurrencies and stocks by combining the results of 
-    fetch_crypto_prices and fetch_stock_prices.
-    :return: A combined dictionary of all assets and their respective data.
+    Run every data source concurrently and collect whatever finishes within its deadline.
+    :param sources: Dictionary mapping a source name to a zero-argument fetch function.
+    :param budget: Overall time budget in seconds; sources still running after it are reported as timed out.
+    :return: Tuple of (results, statuses) where results maps source name to its data and statuses maps
+             source name to {"status": "ok" | "error" | "timeout", "elapsed": seconds}.
     """
-    # Fetch cryptocurrency data
-    crypto_data = fetch_crypto_prices() or {}  # Default to an empty dictionary if None
-    # Fetch stock data
-    stock_data = fetch_stock_prices() or {}  # Default to an empty dictionary if None
+    if sources is None:
+        sources = {"crypto": fetch_crypto_prices, "stocks": fetch_stock_prices}
+
+    start = time.monotonic()
+    # Submit every source at once so the refresh is bounded by the slowest source, not the sum
+    # Sources run on pool threads, so wrap them to be included in a requested profile capture
+    futures = {_executor.submit(metrics.profiled(func)): name for name, func in sources.items()}
+    # Each source gets its own deadline, never later than the overall budget
+    deadlines = {
+        name: start + min(SOURCE_TIMEOUTS.get(name, budget), budget) for name in sources
+    }
+
+    results = {}
+    statuses = {}
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        # Give up on any source whose deadline has already passed
+        for future in list(pending):
+            name = futures[future]
+            if now >= deadlines[name]:
+                pending.discard(future)
+                future.cancel()  # Only prevents start-up; a running request is left to finish in the background
+                statuses[name] = {"status": "timeout", "elapsed": now - start}
+                metrics.SOURCE_TOTAL.inc(source=name, status="timeout")
+                metrics.SOURCE_SECONDS.observe(now - start, source=name)
+        if not pending:
+            break
+
+        # Wait until the next source completes or the nearest deadline is reached
+        next_deadline = min(deadlines[futures[future]] for future in pending)
+        done, pending = wait(pending, timeout=max(0, next_deadline - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            elapsed = time.monotonic() - start
+            try:
+                data = future.result()
+            except Exception as e:
+                # The fetch functions handle their own errors, but guard against anything unexpected
+                print(f"Error in {name} source: {e}")
+                data = None
+            if data is None:
+                statuses[name] = {"status": "error", "elapsed": elapsed}
+            else:
+                results[name] = data
+                statuses[name] = {"status": "ok", "elapsed": elapsed}
+            metrics.SOURCE_TOTAL.inc(source=name, status=statuses[name]["status"])
+            metrics.SOURCE_SECONDS.observe(elapsed, source=name)
 
-    # Combine cryptocurrency and stock data into a single dictionary
-    return {**crypto_data, **stock_data}
+    return results, statuses
+
+def fetch_prices_with_status(budget=FETCH_BUDGET, coins=None, stocks=None):
+    """
+    Fetch prices for cryptocurrencies and stocks in parallel and report how each source fared.
+    :param budget: Overall time budget in seconds for the refresh.
+    :param coins: Optional subset of coins to fetch ({id: name}); defaults to CRYPTO_COINS.
+    :param stocks: Optional subset of stocks to fetch ({name: ticker}); defaults to STOCKS.
+    :return: Tuple of (combined data dictionary, per-source status dictionary).
+    """
+    sources = None
+    if coins is not None or stocks is not None:
+        # Only run the sources that have something to fetch (e.g. for a PollScheduler selection)
+        sources = {}
+        if coins:
+            sources["crypto"] = lambda: fetch_crypto_prices(coins)
+        if stocks:
+            sources["stocks"] = lambda: fetch_stock_prices(stocks)
+    with metrics.profile_cycle(), metrics.timer(metrics.CYCLE_SECONDS):
+        results, statuses = fetch_sources(sources, budget=budget)
+    # Combine whichever sources returned in time into a single dictionary
+    combined = {}
+    for data in results.values():
+        combined.update(data)
+    return combined, statuses
+
+def fetch_prices(coins=None, stocks=None):
+    """
+    Fetch prices for both cryptocurrencies and stocks by combining the results of 
+    fetch_crypto_prices and fetch_stock_prices, which run concurrently.
+    :param coins: Optional subset of coins to fetch ({id: name}); defaults to CRYPTO_COINS.
+    :param stocks: Optional subset of stocks to fetch ({name: ticker}); defaults to STOCKS.
+    :return: A combined dictionary of all assets and their respective data (partial if a source fails or times out).
+    """
+    combined, _ = fetch_prices_with_status(coins=coins, stocks=stocks)
+    return combined
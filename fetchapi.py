@@ -1,60 +1,265 @@
 import os
-import requests
+import time
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import http_client
 from serpapi import GoogleSearch
-from PIL import Image
-from io import BytesIO
+from image_store import ImageStore, sniff_format, validate_image, SNIFF_BYTES
 
 # Configuration
 API_KEY = "YOUR_SERPAPI_KEY"
 SEARCH_QUERY = "Ned Flanders"
 OUTPUT_DIR = "ned_flanders_images"
 MAX_IMAGES = 1000
+MAX_WORKERS = 32  # Downloads running at once
+TRANSIENT_STATUSES = {408, 429}  # Client errors worth retrying on a later run
+PER_HOST_LIMIT = 4  # Downloads running at once against a single host
+TIMEOUT = (5, 10)  # Connect and read timeouts in seconds
+CHUNK_SIZE = 64 * 1024  # Bytes written per chunk while streaming
+PHASH_CLUSTERING = False  # Group near-duplicate images with a perceptual hash
+VALIDATION_WORKERS = os.cpu_count()  # Processes decoding and checking downloaded images
+MIN_WIDTH = 0  # Reject images narrower than this (pixels)
+MIN_HEIGHT = 0  # Reject images shorter than this (pixels)
+THUMBNAILS = False  # Save a JPEG thumbnail of every accepted image
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_DIR = os.path.join(OUTPUT_DIR, "thumbnails")
 
 # Ensure the output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def fetch_image_urls():
-    """Fetch image URLs using SerpAPI."""
-    image_urls = []
+def fetch_page(page):
+    """Fetch one page of image results using SerpAPI."""
     search_params = {
         "q": SEARCH_QUERY,
         "tbm": "isch",
         "api_key": API_KEY,
-        "ijn": 0  # Index of results page
+        "ijn": page  # Index of results page
     }
+    search = GoogleSearch(search_params)
+    results = search.get_dict()
+    return results.get("images_results", [])
+
+def iter_image_urls():
+    """Yield image URLs page by page, prefetching the next page while the current one is consumed."""
+    count = 0
     page = 0
-    
-    while len(image_urls) < MAX_IMAGES:
-        search_params['ijn'] = page
-        search = GoogleSearch(search_params)
-        results = search.get_dict()
-        images = results.get("images_results", [])
-        
-        for img in images:
-            if len(image_urls) >= MAX_IMAGES:
+    with ThreadPoolExecutor(max_workers=1) as pager:
+        next_page = None
+        while count < MAX_IMAGES:
+            if next_page is None:
+                next_page = pager.submit(fetch_page, page)
+            try:
+                images = next_page.result()
+            except Exception as e:
+                print(f"Failed to fetch results page {page}: {e}")
                 break
-            image_urls.append(img.get("original"))
-        
-        page += 1
-    
-    return image_urls
+            if not images:
+                break  # No more results
+            page += 1
+            next_page = None
+            if count + len(images) < MAX_IMAGES:
+                # Start fetching the next page before handing out this one (a search costs API quota,
+                # so only when this page cannot reach MAX_IMAGES on its own)
+                next_page = pager.submit(fetch_page, page)
+
+            for img in images:
+                if count >= MAX_IMAGES:
+                    break
+                url = img.get("original")
+                if url:
+                    count += 1
+                    yield url
+        if next_page is not None:
+            next_page.cancel()
+
+def fetch_image_urls():
+    """Fetch image URLs using SerpAPI."""
+    return list(iter_image_urls())
+
+class Progress:
+    """Thread-safe download counters with throughput reporting."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def update(self, size=None):
+        """Record one finished download (size None means it failed) and print progress."""
+        with self.lock:
+            if size is None:
+                self.failed += 1
+            else:
+                self.done += 1
+                self.bytes += size
+            elapsed = max(time.monotonic() - self.start, 1e-6)
+            finished = self.done + self.failed
+            print(f"Downloaded image {finished}/{self.total or '?'} "
+                  f"({self.done / elapsed:.1f} img/s, {self.bytes / elapsed / 1e6:.2f} MB/s, {self.failed} failed)")
+
+class HostDispatcher:
+    """Hands downloads to the pool at most PER_HOST_LIMIT per host, queueing the rest per host.
+
+    A download only reaches a worker once its host has a free slot, so workers are never parked on a
+    busy host while URLs for other hosts wait behind them.
+    """
+
+    def __init__(self, executor, limit=PER_HOST_LIMIT):
+        self.executor = executor
+        self.limit = limit
+        self.pending = {}  # host -> deque of (function, args) waiting for a slot
+        self.running = {}  # host -> downloads submitted and not finished
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+
+    def submit(self, url, func, *args):
+        """Run func(*args) for a URL as soon as its host has a free slot."""
+        host = urlparse(url).hostname or ""
+        with self.lock:
+            if self.running.get(host, 0) >= self.limit:
+                self.pending.setdefault(host, deque()).append((func, args))
+                return
+            self.running[host] = self.running.get(host, 0) + 1
+        self._start(host, func, args)
+
+    def _start(self, host, func, args):
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda _: self._finished(host))
+
+    def _finished(self, host):
+        with self.lock:
+            waiting = self.pending.get(host)
+            if not waiting:
+                self.running[host] -= 1
+                self.idle.notify_all()
+                return
+            func, args = waiting.popleft()  # The slot passes straight to the host's next download
+        self._start(host, func, args)
+
+    def wait(self):
+        """Block until every submitted download, including queued ones, has finished."""
+        with self.lock:
+            while any(self.running.values()):
+                self.idle.wait()
+
+def detect_format(url, head, store):
+    """Detect the image format from the leading bytes, rejecting the URL for good if it is not an image."""
+    img_format = sniff_format(head[:SNIFF_BYTES])
+    if img_format is None:
+        store.reject(url, "not a supported image format")
+        raise ValueError("not a supported image format")
+    return img_format
+
+def download_image(url, store, progress, validators):
+    """Stream one image to a temporary file and hand it to the validation stage."""
+    temp_path = None
+    try:
+        with http_client.get(url, timeout=TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                reason = f"HTTP {response.status_code}"
+                if 400 <= response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES:
+                    store.reject(url, reason)  # Gone or forbidden; later runs skip it
+                raise ValueError(reason)
+            # Stream the body to disk instead of holding it in memory
+            fd, temp_path = tempfile.mkstemp(dir=OUTPUT_DIR, suffix=".part")
+            size = 0
+            img_format = None
+            head = b""  # Leading bytes collected for format detection
+            digest = hashlib.sha256()  # Hash while streaming so identical content is stored once
+            with os.fdopen(fd, "wb") as file:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if img_format is None:
+                        # Chunks can be shorter than SNIFF_BYTES, so detect the format once enough bytes have arrived
+                        head += chunk
+                        if len(head) >= SNIFF_BYTES:
+                            img_format = detect_format(url, head, store)
+                    file.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            if img_format is None:
+                img_format = detect_format(url, head, store)  # The whole body was shorter than SNIFF_BYTES
+
+        sha256 = digest.hexdigest()
+        if store.has_hash(sha256):
+            # Same content as an image that is already stored and validated
+            file_name, _ = store.add(url, temp_path, sha256, img_format)
+            print(f"{url} has the same content as {file_name}")
+            progress.update(size)
+            return
+
+        # Decoding, size checks and thumbnails run in the process pool, off the network threads
+        thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{sha256[:16]}.jpg") if THUMBNAILS else None
+        future = validators.submit(
+            validate_image, temp_path, MIN_WIDTH, MIN_HEIGHT, thumbnail_path, THUMBNAIL_SIZE, PHASH_CLUSTERING
+        )
+        future.add_done_callback(
+            lambda done, path=temp_path: finish_image(done, url, path, sha256, img_format, size, store, progress)
+        )
+        temp_path = None  # The validation stage now owns the file
+    except Exception as e:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        print(f"Failed to download {url}: {e}")
+        progress.update(None)
+
+def finish_image(future, url, temp_path, sha256, img_format, size, store, progress):
+    """Store a validated image, or discard it if validation failed."""
+    try:
+        result = future.result()
+        if result["ok"]:
+            store.add(url, temp_path, sha256, img_format, result["phash"])
+            progress.update(size)
+            return
+        reason = result["reason"]
+        store.reject(url, reason)
+    except Exception as e:
+        reason = str(e)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    print(f"Rejected {url}: {reason}")
+    progress.update(None)
+
+# Worker processes are started fresh rather than forked from a process with running download threads
+SPAWN = multiprocessing.get_context("spawn")
 
 def download_images(image_urls):
-    """Download images from the list of URLs."""
-    for idx, url in enumerate(image_urls):
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                img = Image.open(BytesIO(response.content))
-                img_format = img.format if img.format else 'jpg'
-                img.save(os.path.join(OUTPUT_DIR, f"ned_flanders_{idx+1}.{img_format}"))
-                print(f"Downloaded image {idx+1}/{len(image_urls)}")
-        except Exception as e:
-            print(f"Failed to download {url}: {e}")
+    """Download images concurrently; image_urls may be a list or a stream of URLs still being fetched."""
+    store = ImageStore(OUTPUT_DIR, "ned_flanders")
+    if THUMBNAILS:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    progress = Progress(len(image_urls) if hasattr(image_urls, "__len__") else None)
+    skipped = 0
+    try:
+        # The process pool is closed last so it finishes validating every download
+        with ProcessPoolExecutor(max_workers=VALIDATION_WORKERS, mp_context=SPAWN) as validators, \
+                ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            dispatcher = HostDispatcher(executor)
+            # Each URL is queued for download as soon as the pager produces it
+            for url in image_urls:
+                if store.has_url(url):
+                    skipped += 1  # Downloaded by an earlier run
+                    if progress.total:
+                        progress.total -= 1
+                    continue
+                dispatcher.submit(url, download_image, url, store, progress, validators)
+            # Queued downloads are submitted as slots free up, so wait for them before the pool shuts down
+            dispatcher.wait()
+    finally:
+        # Save progress even if the run is interrupted, so the next run resumes
+        store.save()
+    print(f"Skipped {skipped} URLs already in the manifest.")
+    elapsed = time.monotonic() - progress.start
+    print(f"Downloaded {progress.done} images ({progress.bytes / 1e6:.1f} MB) in {elapsed:.1f}s, {progress.failed} failed.")
 
 if __name__ == '__main__':
-    print("Fetching image URLs...")
-    image_urls = fetch_image_urls()
-    print(f"Fetched {len(image_urls)} image URLs. Starting download...")
-    download_images(image_urls)
+    print("Fetching image URLs and downloading as they arrive...")
+    download_images(iter_image_urls())
     print("All images downloaded.")
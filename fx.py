@@ -0,0 +1,124 @@
+import os  # Import for the DISPLAY_CURRENCY setting
+import threading  # Import to guard the last known rate table
+
+from quote_cache import quote_cache  # Import the shared cache, which keeps the rate table for FX_TTL
+from quotes import Quote  # Import typed quote records
+
+"""
+FX Rates
+
+Prices are fetched once in BASE_CURRENCY; every other display currency is converted locally
+from a small exchange-rate table, so response sizes do not grow with the number of currencies shown.
+- The table comes from CoinGecko's /exchange_rates endpoint (values per 1 BTC) and is cached for
+  FX_TTL seconds through the shared quote cache (including its on-disk copy).
+- convert_quotes() converts a whole snapshot with one vectorized multiply per price field.
+- Percentage changes are kept as reported in the base currency.
+- Historical charts are the exception: a single current rate would misprice old points, so they are
+  fetched in the display currency itself (see crypto_charts.chart_series).
+"""
+
+# Currency every price is fetched in
+BASE_CURRENCY = "usd"
+# Currency prices are shown in unless the user picks another one
+DISPLAY_CURRENCY = os.environ.get("DISPLAY_CURRENCY", "gbp")
+# Currencies offered by the dashboard's currency switch
+DISPLAY_CURRENCIES = ["gbp", "usd", "eur", "jpy"]
+# Seconds the rate table is reused before it is fetched again
+FX_TTL = 3600
+# Price fields converted between currencies (volumes and percentage changes are not)
+PRICE_FIELDS = ("price", "high", "low")
+
+EXCHANGE_RATES_URL = "https://api.coingecko.com/api/v3/exchange_rates"
+
+_last_rates = None  # Last table fetched, used if a refresh fails
+_rates_lock = threading.Lock()
+
+
+def _parse_rates(data):
+    """
+    Turn an /exchange_rates response into {currency code: value of 1 BTC}.
+    """
+    return {code: float(entry["value"]) for code, entry in data["rates"].items() if entry.get("value")}
+
+
+def get_rates():
+    """
+    Get the exchange-rate table, fetching it at most once per FX_TTL.
+    :return: Dictionary mapping currency code to the value of 1 BTC in that currency.
+    """
+    global _last_rates
+    try:
+        rates = _parse_rates(quote_cache.get_json(EXCHANGE_RATES_URL, ttl=FX_TTL))
+    except Exception as e:
+        with _rates_lock:
+            if _last_rates is None:
+                raise
+            print(f"Error refreshing exchange rates, using the last known table: {e}")
+            return _last_rates
+    with _rates_lock:
+        _last_rates = rates
+    return rates
+
+
+def cached_rates():
+    """
+    Get the last exchange-rate table held in memory or in the on-disk cache, without any network call.
+    :return: The rate table, or None if none has been fetched yet.
+    """
+    with _rates_lock:
+        if _last_rates is not None:
+            return _last_rates
+    data = quote_cache.peek(EXCHANGE_RATES_URL)
+    return None if data is None else _parse_rates(data)
+
+
+def rate(source, target, rates):
+    """
+    Get the factor that converts an amount from one currency to another.
+    :param source: Currency code the amount is in.
+    :param target: Currency code to convert to.
+    :param rates: Rate table from get_rates().
+    :return: Conversion factor.
+    """
+    if source == target:
+        return 1.0
+    try:
+        return rates[target] / rates[source]
+    except KeyError as e:
+        raise ValueError(f"No exchange rate for {e.args[0]}")
+
+
+def convert_quotes(quotes, currency, rates):
+    """
+    Convert every quote in a snapshot to one currency.
+    :param quotes: Dictionary mapping asset name to Quote (in any mix of currencies).
+    :param currency: Currency code to convert to.
+    :param rates: Rate table from get_rates().
+    :return: New dictionary mapping asset name to Quote in the target currency.
+    """
+    import numpy as np  # Imported here so NumPy is only needed once prices are converted
+
+    names = list(quotes)
+    records = list(quotes.values())
+    # One factor per source currency, then one multiply per field across the whole snapshot
+    factors = {code: rate(code, currency, rates) for code in {quote.currency for quote in records}}
+    scale = np.fromiter((factors[quote.currency] for quote in records), dtype=np.float64, count=len(records))
+    converted = {
+        field: np.fromiter((getattr(quote, field) for quote in records), dtype=np.float64, count=len(records)) * scale
+        for field in PRICE_FIELDS
+    }
+    return {
+        name: Quote(
+            symbol=quote.symbol,
+            name=quote.name,
+            kind=quote.kind,
+            currency=currency,
+            price=float(converted["price"][i]),
+            change_24hr=quote.change_24hr,
+            change_7d=quote.change_7d,
+            high=float(converted["high"][i]),
+            low=float(converted["low"][i]),
+            volume=quote.volume,
+        )
+        for i, (name, quote) in enumerate(zip(names, records))
+    }
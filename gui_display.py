@@ -1,9 +1,17 @@
 import tkinter as tk  # Import tkinter for GUI elements
-from fetch_prices import fetch_prices  # Import fetch_prices function to fetch asset data
+from fetch_prices import fetch_prices, CRYPTO_COINS, STOCKS  # Import the fetch function and the configured watchlist
+import metrics  # Import to time dashboard updates and export metrics
+from quotes import format_price, format_percent, save_snapshot, load_snapshot  # Import quote formatting and snapshot files
+from timeseries_store import TimeSeriesStore  # Import the local price history used to seed indicators
+from poll_scheduler import PollScheduler  # Import the adaptive refresh scheduler
+from fx import DISPLAY_CURRENCY, DISPLAY_CURRENCIES, get_rates, cached_rates, convert_quotes, rate  # Import local currency conversion
 import time
+import threading  # Import for running network fetches off the Tk main thread
+import queue  # Import for handing fetched snapshots back to the UI thread
 import os  # Import for folder and file management
+import tempfile  # Import for the default saved snapshot location
+import argparse  # Import for the --subscribe option
 from datetime import datetime  # Import for timestamping
-from PIL import ImageGrab  # Import for taking screenshots
 """
 Current Features:
 - Displays live prices for cryptocurrencies (e.g., Bitcoin, Ethereum, Litecoin) and stocks (e.g., Tesla, Apple, S&P 500).
@@ -37,9 +45,26 @@ Future Improvements:
 
 """
 
+# Bounds on how long to wait before asking the poll scheduler again (milliseconds)
+MIN_SCHEDULE_MS = 1000
+MAX_SCHEDULE_MS = 30000
+# How often the UI thread checks for finished fetches (milliseconds)
+POLL_INTERVAL_MS = 100
+# Last snapshot shown, saved so the next start can display it immediately
+SNAPSHOT_PATH = os.environ.get("DASHBOARD_SNAPSHOT", os.path.join(tempfile.gettempdir(), "dashboard_snapshot.bin"))
+# Number of table rows drawn at once; longer asset lists scroll through these rows
+VISIBLE_ROWS = 11
+# Table columns as (key, header text)
+COLUMNS = [("name", "Asset"), ("price", "Price"), ("change_24hr", "24%"), ("drawdown", "Drawdown")]
+
 
 class CryptoDashboard:
-    def __init__(self, root):
+    def __init__(self, root, subscribe_address=None):
+        """
+        :param root: Tk root window.
+        :param subscribe_address: Optional fetch daemon address (see fetch_daemon.py); when set, snapshots
+                                  published by the daemon are shown instead of fetching prices here.
+        """
         # Set up the main application window (root)
         self.root = root
         self.root.title("Rorie's Dashboard")  # Set the window title
@@ -84,13 +109,23 @@ class CryptoDashboard:
         )
         self.stock_button.pack(side="left", padx=10)  # Position the button on the left with padding
 
+        # Add a menu to switch the display currency; prices are converted locally, with no network call
+        self.currency = tk.StringVar(value=DISPLAY_CURRENCY)
+        self.currency_menu = tk.OptionMenu(
+            self.button_frame,
+            self.currency,
+            *DISPLAY_CURRENCIES,
+            command=self.set_currency,  # Action: redraw prices in the chosen currency
+        )
+        self.currency_menu.config(font=("Arial", 12), bg="#1e1e2f", fg="white", width=6)
+        self.currency_menu.pack(side="left", padx=10)  # Position the menu next to the filter buttons
+
         # Create a frame to hold the data table
         self.table_frame = tk.Frame(root, bg="#121212")  # Frame background matches the main window
         self.table_frame.pack(pady=10)  # Add padding around the table frame
 
         # Define the table headers and display them
-        headers = ["Asset", "Price", "24%"]  # Column headers
-        for col, text in enumerate(headers):  # Iterate through each header
+        for col, (_, text) in enumerate(COLUMNS):  # Iterate through each header
             tk.Label(
                 self.table_frame,
                 text=text,  # Header text
@@ -101,24 +136,54 @@ class CryptoDashboard:
                 anchor="center",  # Center-align text in headers
             ).grid(row=0, column=col, padx=5, pady=5)  # Position headers in a grid layout
 
-        # Initialize a dictionary to store rows for each asset
-        self.rows = {}
-        # Define the list of all assets, specifying their types for filtering
-        self.assets = [
-            # Cryptocurrencies
-            {"name": "Bitcoin", "type": "crypto"},
-            {"name": "Ethereum", "type": "crypto"},
-            {"name": "Litecoin", "type": "crypto"},
-            {"name": "XRP", "type": "crypto"},
-            {"name": "Monero", "type": "crypto"},
-            {"name": "Cardano", "type": "crypto"},
-            {"name": "Dogecoin", "type": "crypto"},
-            # Stocks
-            {"name": "S&P 500", "type": "stock"},
-            {"name": "Tesla", "type": "stock"},
-            {"name": "Nio", "type": "stock"},
-            {"name": "Apple", "type": "stock"},
-        ]
+        # Create a fixed pool of row widgets; scrolling and filtering only change what they show
+        self.slots = []
+        for i in range(1, VISIBLE_ROWS + 1):
+            bg_color = "#2b2b2b" if i % 2 == 0 else "#1e1e2f"  # Alternate row colors
+            slot = {"labels": {}, "text": {}, "visible": True}
+            for col, (key, _) in enumerate(COLUMNS):
+                label = tk.Label(
+                    self.table_frame,
+                    text="",
+                    font=("Arial", 12),
+                    fg="white",
+                    bg=bg_color,
+                    width=20,
+                    anchor="center",
+                )
+                label.grid(row=i, column=col, padx=5, pady=5)
+                slot["labels"][key] = label
+                slot["text"][key] = ""  # Last text drawn, used to skip unchanged cells
+            self.slots.append(slot)
+
+        # Scrollbar for asset lists longer than the visible rows
+        self.scrollbar = tk.Scrollbar(self.table_frame, orient="vertical", command=self.scroll_assets)
+        self.scrollbar.grid(row=1, column=len(COLUMNS), rowspan=VISIBLE_ROWS, sticky="ns")
+        self.table_frame.bind_all("<MouseWheel>", self.on_mousewheel)  # Windows and macOS
+        self.table_frame.bind_all("<Button-4>", self.on_mousewheel)  # Linux scroll up
+        self.table_frame.bind_all("<Button-5>", self.on_mousewheel)  # Linux scroll down
+        self.scroll_offset = 0  # Index of the first asset shown
+
+        # Latest Quote record for each asset, keyed by asset name (in the currency it was fetched in)
+        self.quotes = {}
+        # The same quotes converted to the display currency, which is what the table shows
+        self.display_quotes = {}
+        # Exchange-rate table; refreshed by the fetch worker, starting from the cached copy if there is one
+        self.rates = cached_rates()
+        # Latest drawdown from peak for each asset, keyed by asset name
+        self.drawdowns = {}
+        # Indicator state per asset; only touched by the fetch worker (fetches never overlap)
+        self.indicators = {}
+        self.history = None  # Local time-series store, opened by the fetch worker
+        self.snapshot = {}  # Every quote fetched so far, saved for the next start (fetch worker only)
+        # Decides which assets to refresh and when; visible rows and alerted coins go first
+        self.scheduler = PollScheduler()
+        self.scheduler.add_assets(CRYPTO_COINS, STOCKS)
+        self.alert_assets_loaded = False
+        self.visible_names = None
+        # Define the list of all assets from the watchlist, specifying their types for filtering
+        self.assets = [{"name": name, "type": "crypto"} for name in CRYPTO_COINS.values()]
+        self.assets += [{"name": name, "type": "stock"} for name in STOCKS]
         # Start by showing all assets
         self.active_assets = self.assets
         self.display_assets()  # Display all assets initially
@@ -143,67 +208,138 @@ class CryptoDashboard:
         )
         self.error_label.pack(pady=5)  # Add padding around the error label
 
-        # Start the periodic update process
-        self.update_prices()
+        # Show the last saved snapshot straight away, marked stale until the first fetch arrives
+        saved = load_snapshot(SNAPSHOT_PATH)
+        if saved is not None:
+            saved_at, saved_quotes = saved
+            self.quotes.update(saved_quotes)
+            self.convert_quotes()
+            self.display_assets()
+            self.last_update_label.config(
+                text=f"Last Update: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(saved_at))} (stale, refreshing...)",
+                fg="orange",
+            )
+
+        # Queue used by the background fetch worker to hand finished snapshots to the UI thread
+        self.results = queue.Queue()
+        self.fetch_in_flight = False  # True while a background fetch is running
+        self.fetch_sequence = 0  # Incremented for every fetch that is started
+        self.applied_sequence = 0  # Sequence number of the snapshot currently on screen
+
+        # Start the periodic update process (or listen to the fetch daemon) and begin polling for results
+        if subscribe_address is not None:
+            threading.Thread(
+                target=self.subscribe_worker,
+                args=(subscribe_address,),
+                name="price-subscribe",
+                daemon=True,
+            ).start()
+        else:
+            self.update_prices()
+        self.poll_results()
 
     def display_assets(self):
         """
-        Display rows for the currently active assets.
+        Display the currently active assets in the visible rows.
+        Only cells whose text has changed are redrawn, and unused rows are hidden.
         """
-        # Clear existing rows from the table frame
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()  # Remove all widgets in the frame
+        # Keep the scroll position within the list
+        max_offset = max(0, len(self.active_assets) - VISIBLE_ROWS)
+        self.scroll_offset = min(max(0, self.scroll_offset), max_offset)
 
-        # Redraw the headers
-        headers = ["Asset", "Price", "24%"]  # Column headers
-        for col, text in enumerate(headers):
-            tk.Label(
-                self.table_frame,
-                text=text,  # Header text
-                font=("Arial", 14, "bold"),  # Font style and size for headers
-                fg="white",  # Text color
-                bg="#1e1e2f",  # Header background color
-                width=20,
-                anchor="center",
-            ).grid(row=0, column=col, padx=5, pady=5)  # Position headers
-
-        # Populate the table with rows for each active asset
-        for i, asset in enumerate(self.active_assets, start=1):
-            bg_color = "#2b2b2b" if i % 2 == 0 else "#1e1e2f"  # Alternate row colors
-            asset_name = asset["name"]  # Get the asset name
-            self.rows[asset_name] = {}
-            # Create and display the asset name cell
-            tk.Label(
-                self.table_frame,
-                text=asset_name,
-                font=("Arial", 12),
-                fg="white",
-                bg=bg_color,
-                width=20,
-                anchor="center",
-            ).grid(row=i, column=0, padx=5, pady=5)
-            # Create and display the price cell
-            self.rows[asset_name]["price"] = tk.Label(
-                self.table_frame,
-                text="Fetching...",
-                font=("Arial", 12),
-                fg="white",
-                bg=bg_color,
-                width=20,
-                anchor="center",
-            )
-            self.rows[asset_name]["price"].grid(row=i, column=1, padx=5, pady=5)
-            # Create and display the 24% change cell
-            self.rows[asset_name]["change_24hr"] = tk.Label(
-                self.table_frame,
-                text="--",
-                font=("Arial", 12),
-                fg="white",
-                bg=bg_color,
-                width=20,
-                anchor="center",
-            )
-            self.rows[asset_name]["change_24hr"].grid(row=i, column=2, padx=5, pady=5)
+        for i, slot in enumerate(self.slots):
+            index = self.scroll_offset + i
+            if index >= len(self.active_assets):
+                # Hide rows that have no asset to show
+                if slot["visible"]:
+                    for label in slot["labels"].values():
+                        label.grid_remove()
+                    slot["visible"] = False
+                continue
+
+            if not slot["visible"]:
+                # Show the row again in its original grid position
+                for label in slot["labels"].values():
+                    label.grid()
+                slot["visible"] = True
+
+            asset_name = self.active_assets[index]["name"]
+            quote = self.display_quotes.get(asset_name)
+            self.set_cell(slot, "name", asset_name)
+            if quote is None:
+                # No data received yet for this asset
+                self.set_cell(slot, "price", "Fetching...")
+                self.set_cell(slot, "change_24hr", "--")
+                self.set_cell(slot, "drawdown", "--")
+            else:
+                # Format the numbers only for rows that are actually on screen
+                self.set_cell(slot, "price", format_price(quote.price, quote.currency))
+                self.set_cell(slot, "change_24hr", "--" if quote.kind == "stock" else format_percent(quote.change_24hr))
+                drawdown = self.drawdowns.get(asset_name)  # Not known yet for a saved snapshot
+                self.set_cell(slot, "drawdown", "--" if drawdown is None else format_percent(drawdown * 100))
+
+        # Refresh the rows on screen sooner than the rest
+        visible_names = [asset["name"] for asset in self.active_assets[self.scroll_offset:self.scroll_offset + VISIBLE_ROWS]]
+        if visible_names != self.visible_names:
+            self.visible_names = visible_names
+            self.scheduler.set_visible(visible_names)
+
+        # Update the scrollbar to show which part of the list is visible
+        total = max(len(self.active_assets), 1)
+        self.scrollbar.set(self.scroll_offset / total, min(1.0, (self.scroll_offset + VISIBLE_ROWS) / total))
+
+    def convert_quotes(self):
+        """
+        Convert every quote to the display currency in one vectorized pass.
+        Falls back to the fetched currency until an exchange-rate table is available.
+        """
+        self.display_quotes = self.quotes
+        if self.rates and self.quotes:
+            try:
+                self.display_quotes = convert_quotes(self.quotes, self.currency.get(), self.rates)
+            except ValueError as e:
+                print(f"Error converting prices: {e}")
+
+    def set_currency(self, currency):
+        """
+        Show prices in another currency, converted locally from the cached exchange rates.
+        :param currency: Currency code chosen in the menu (e.g. "eur").
+        """
+        self.convert_quotes()
+        self.display_assets()
+
+    def set_cell(self, slot, key, text):
+        """
+        Update one cell, skipping the Tk call if the text is unchanged.
+        :param slot: Row slot containing the cell.
+        :param key: Column key of the cell.
+        :param text: Text to display.
+        """
+        if slot["text"][key] != text:
+            slot["labels"][key].config(text=text)
+            slot["text"][key] = text
+
+    def scroll_assets(self, *args):
+        """
+        Handle scrollbar movement.
+        :param args: Scrollbar command arguments ("moveto", fraction) or ("scroll", amount, "units" | "pages").
+        """
+        if args[0] == "moveto":
+            self.scroll_offset = int(float(args[1]) * len(self.active_assets))
+        elif args[0] == "scroll":
+            step = VISIBLE_ROWS if args[2] == "pages" else 1
+            self.scroll_offset += int(args[1]) * step
+        self.display_assets()
+
+    def on_mousewheel(self, event):
+        """
+        Scroll the table with the mouse wheel.
+        :param event: Tk mouse wheel event.
+        """
+        if event.num == 4 or event.delta > 0:
+            self.scroll_assets("scroll", -1, "units")
+        else:
+            self.scroll_assets("scroll", 1, "units")
 
     def filter_assets(self, asset_type):
         """
@@ -212,33 +348,186 @@ class CryptoDashboard:
         """
         # Filter assets by their type
         self.active_assets = [asset for asset in self.assets if asset["type"] == asset_type]
+        self.scroll_offset = 0  # Start from the top of the filtered list
         self.display_assets()  # Refresh the table to show only the filtered assets
 
     def update_prices(self):
         """
-        Fetch and update prices for all displayed assets.
+        Start a background fetch of the assets the poll scheduler says are due, and schedule the next check.
+        A new fetch is never started while the previous one is still running.
+        """
+        if not self.fetch_in_flight:
+            coins, stocks = self.scheduler.select()
+            if coins or stocks:
+                self.fetch_in_flight = True
+                self.fetch_sequence += 1
+                # Run the network fetch on a daemon thread so the window stays responsive
+                threading.Thread(
+                    target=self.fetch_worker,
+                    args=(self.fetch_sequence, coins, stocks),
+                    name="price-fetch",
+                    daemon=True,
+                ).start()
+
+        # Check again when the next asset is due
+        delay_ms = int(self.scheduler.next_delay() * 1000)
+        self.root.after(min(MAX_SCHEDULE_MS, max(MIN_SCHEDULE_MS, delay_ms)), self.update_prices)
+
+    def fetch_worker(self, sequence, coins=None, stocks=None):
+        """
+        Fetch prices off the UI thread and put the snapshot on the results queue.
+        :param sequence: Sequence number identifying this fetch.
+        :param coins: Coins to fetch ({id: name}); defaults to the whole watchlist.
+        :param stocks: Stocks to fetch ({name: ticker}); defaults to the whole watchlist.
+        """
+        data = None
+        drawdowns = {}
+        try:
+            if not self.alert_assets_loaded:
+                self.load_alert_assets()
+            data = fetch_prices(coins, stocks)  # Fetch data using the fetch_prices function
+            self.refresh_rates()
+            self.scheduler.observe(data)
+            self.save_snapshot(data)
+            drawdowns = self.update_indicators(data)
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+        finally:
+            # Always report back so the UI knows the fetch has finished
+            self.results.put((sequence, data, drawdowns))
+
+    def subscribe_worker(self, address):
+        """
+        Receive snapshots from the fetch daemon and put them on the results queue, like fetch_worker.
+        :param address: Fetch daemon address, or "" for the default.
+        """
+        from fetch_daemon import subscribe  # Imported here so the standalone dashboard does not need it
+
+        sequence = 0
+        for _, data in subscribe(address or None):
+            sequence += 1
+            self.refresh_rates()
+            self.save_snapshot(data)
+            try:
+                drawdowns = self.update_indicators(data)
+            except Exception as e:
+                print(f"Error updating indicators: {e}")
+                drawdowns = {}
+            self.results.put((sequence, data, drawdowns))
+
+    def refresh_rates(self):
+        """
+        Refresh the exchange-rate table (runs on the fetch worker thread; the table is cached for
+        an hour, so this is usually a cache hit). The UI thread picks it up on the next snapshot.
+        """
+        try:
+            self.rates = get_rates()
+        except Exception as e:
+            print(f"Error fetching exchange rates: {e}")
+
+    def load_alert_assets(self):
+        """
+        Tell the poll scheduler which coins have alert rules (runs on the fetch worker thread,
+        since loading the alert engine imports NumPy).
+        """
+        self.alert_assets_loaded = True
+        try:
+            from alert_engine import load_rules, RULES_PATH
+
+            self.scheduler.set_alert_assets(rule["asset"] for rule in load_rules(RULES_PATH))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading alert rules: {e}")
+
+    def save_snapshot(self, data):
+        """
+        Merge a fetched snapshot into the saved one for the next start (runs on the fetch worker thread).
+        :param data: Dictionary of Quote records, or None if the fetch failed.
+        """
+        if not data:
+            return
+        self.snapshot.update(data)
+        try:
+            save_snapshot(SNAPSHOT_PATH, self.snapshot)
+        except OSError as e:
+            print(f"Error saving snapshot: {e}")
+
+    def update_indicators(self, data):
+        """
+        Add the latest prices to each asset's indicators (runs on the fetch worker thread).
+        Crypto assets are seeded once from the local price history when it is available. That history
+        is stored by crypto_charts in DISPLAY_CURRENCY, so new crypto prices are converted to it first.
+        :param data: Dictionary of Quote records returned by fetch_prices.
+        :return: Dictionary mapping asset name to its current drawdown from peak (a fraction).
+        """
+        from analytics import IndicatorState  # Imported here so NumPy loads on the worker thread, after the first paint
+
+        now_ms = int(time.time() * 1000)
+        drawdowns = {}
+        for asset_name, quote in (data or {}).items():
+            state = self.indicators.get(asset_name)
+            if state is None:
+                state = self.indicators[asset_name] = IndicatorState()
+                if quote.kind == "crypto":
+                    if self.history is None:
+                        self.history = TimeSeriesStore()
+                    points = self.history.query(quote.symbol, DISPLAY_CURRENCY)
+                    if points:
+                        state.update(*zip(*points))
+            price = quote.price
+            if quote.kind == "crypto":
+                try:
+                    price *= rate(quote.currency, DISPLAY_CURRENCY, self.rates or {})
+                except ValueError:
+                    price = float("nan")  # No exchange rate yet; never mix currencies in one series
+            if price == price:  # Skip missing (NaN) prices
+                state.update([now_ms], [price])  # Only the new point is processed
+            drawdowns[asset_name] = state.latest()["drawdown"]
+        return drawdowns
+
+    def poll_results(self):
+        """
+        Apply the newest finished snapshot, if any, and schedule the next poll.
+        Runs on the Tk main thread and never blocks.
+        """
+        latest = None
+        # Drain the queue, keeping only the newest snapshot
+        while True:
+            try:
+                sequence, data, drawdowns = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if sequence == self.fetch_sequence:
+                self.fetch_in_flight = False  # The most recent fetch has finished
+            if latest is None or sequence > latest[0]:
+                latest = (sequence, data, drawdowns)
+
+        # Drop snapshots older than the one already on screen
+        if latest is not None and latest[0] > self.applied_sequence:
+            self.applied_sequence = latest[0]
+            self.apply_prices(latest[1], latest[2])
+
+        self.root.after(POLL_INTERVAL_MS, self.poll_results)
+
+    def apply_prices(self, data, drawdowns=None):
+        """
+        Update the table with a fetched snapshot.
+        :param data: Dictionary of Quote records returned by fetch_prices, or None if the fetch failed.
+        :param drawdowns: Optional dictionary of drawdowns from peak computed by the fetch worker.
         """
-        data = fetch_prices()  # Fetch data using the fetch_prices function
         if data:  # Check if data is successfully fetched
-            for asset_name, values in data.items():  # Iterate through fetched data
-                if asset_name in self.rows:  # Update only rows that are displayed
-                    # Update the price cell with the fetched price
-                    self.rows[asset_name]["price"].config(text=f"£{values['price']}")
-                    # Update the 24% change cell with the fetched percentage
-                    if "change_24hr" in values:  # Check if the 24-hour change is available
-                        self.rows[asset_name]["change_24hr"].config(text=values["change_24hr"])
+            with metrics.timer(metrics.UI_UPDATE_SECONDS):
+                self.quotes.update(data)  # Keep the raw records; only visible rows are formatted
+                self.convert_quotes()
+                self.drawdowns.update(drawdowns or {})
+                self.display_assets()  # Redraw only the cells whose text changed
             # Update the last update timestamp
-            self.last_update_label.config(text=f"Last Update: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            self.last_update_label.config(text=f"Last Update: {time.strftime('%Y-%m-%d %H:%M:%S')}", fg="#00ff00")
             self.error_label.config(text="")  # Clear any existing error messages
         else:
             # Display an error message if data fetching fails
             self.error_label.config(text="Error fetching data. Retrying...")
+        metrics.cycle_finished()  # Export the metrics for this refresh
 
-        # Schedule the next update after 30 seconds
-        self.root.after(30000, self.update_prices)
-
-
-        
     def take_screenshot(self):
         """
         Takes a screenshot of the dashboard and saves it in a structured folder hierarchy:
@@ -268,6 +557,7 @@ class CryptoDashboard:
         y1 = y0 + self.root.winfo_height()  # Height of the window
 
         # Capture and save the screenshot
+        from PIL import ImageGrab  # Imported on first use so PIL does not slow down start-up
         screenshot = ImageGrab.grab(bbox=(x0, y0, x1, y1))  # Grab the region of the app
         screenshot.save(screenshot_path)  # Save the screenshot as a PNG file
         print(f"Screenshot saved to {screenshot_path}")  # Log the save location
@@ -277,9 +567,16 @@ class CryptoDashboard:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the asset dashboard.")
+    parser.add_argument("--subscribe", nargs="?", const="", default=None, metavar="ADDRESS",
+                        help="Show snapshots from the fetch daemon instead of fetching prices")
+    args = parser.parse_args()
+
+    # Serve metrics or capture a profile if METRICS_PORT or FETCH_PROFILE is set
+    metrics.start_exporter()
     # Create the root application window
     root = tk.Tk()
     # Initialize the CryptoDashboard with the root window
-    app = CryptoDashboard(root)
+    app = CryptoDashboard(root, subscribe_address=args.subscribe)
     # Run the Tkinter event loop
     root.mainloop()
@@ -0,0 +1,192 @@
+import time  # Import for rate limiting, backoff and timing
+import random  # Import to add jitter to retry delays
+import threading  # Import to make the limiter and stats thread-safe
+from collections import deque  # Import for the recent request log
+from email.utils import parsedate_to_datetime  # Import to parse HTTP-date Retry-After headers
+from urllib.parse import urlparse  # Import to find the host of each request
+
+import requests  # Import requests for the underlying HTTP session
+from requests.adapters import HTTPAdapter  # Import to size the keep-alive connection pool
+
+import metrics  # Import to export request latency histograms
+
+"""
+HTTP Client
+
+One shared client for every CoinGecko, Yahoo and image request:
+- A single requests.Session keeps connections alive, so polling does not repeat the TLS handshake.
+- A token bucket per host keeps us inside each API's published rate limit.
+- 429 and 5xx responses (and connection errors) are retried with jittered exponential backoff,
+  waiting at least as long as the server's Retry-After header asks. A Retry-After longer than
+  RETRY_AFTER_MAX is returned to the caller at once, so it can fall back to cached data.
+- Every request is timed; get_stats() returns per-host totals and a log of recent requests.
+"""
+
+# Requests allowed per host as (requests, per seconds). CoinGecko's Demo API allows 30 calls per minute.
+HOST_LIMITS = {
+    "api.coingecko.com": (30, 60),
+}
+# Number of times a failed request is retried
+MAX_RETRIES = 3
+# Base and maximum delay (in seconds) for exponential backoff
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Longest Retry-After (in seconds) worth waiting for; beyond it the failed response is returned immediately
+RETRY_AFTER_MAX = 120.0
+# Status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Size of the keep-alive pool (per host) and the number of hosts kept pooled
+POOL_MAXSIZE = 32
+POOL_CONNECTIONS = 16
+# Number of recent requests kept for get_stats()
+RECENT_REQUESTS = 200
+
+
+class TokenBucket:
+    def __init__(self, rate, per):
+        """
+        :param rate: Number of requests allowed in each window (also the burst size).
+        :param per: Window length in seconds.
+        """
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / per  # Tokens added per second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _build_session()  # Shared keep-alive session
+_buckets = {host: TokenBucket(rate, per) for host, (rate, per) in HOST_LIMITS.items()}
+_stats = {}  # host -> totals
+_recent = deque(maxlen=RECENT_REQUESTS)  # (url, status, elapsed seconds, attempt)
+_stats_lock = threading.Lock()
+
+
+def _server_delay(response):
+    """
+    Read the delay a response's Retry-After header asks for.
+    :param response: The failed response, or None.
+    :return: Delay in seconds (0 if there is no usable header).
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if not retry_after:
+        return 0.0
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+
+
+def _retry_delay(attempt, response=None):
+    """
+    Work out how long to wait before the next attempt.
+    :param attempt: Number of the attempt that just failed (0 for the first).
+    :param response: The failed response, if any, to read Retry-After from.
+    :return: Delay in seconds.
+    """
+    # Full jitter: a random delay up to the exponential backoff ceiling
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    # Never retry sooner than the server asked
+    return max(delay, _server_delay(response))
+
+
+def _record(host, url, status, elapsed, attempt, failed):
+    metrics.HTTP_SECONDS.observe(elapsed, host=host)
+    metrics.HTTP_REQUESTS.inc(host=host, status=status or "error")
+    with _stats_lock:
+        totals = _stats.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "total_time": 0.0, "max_time": 0.0})
+        totals["requests"] += 1
+        totals["total_time"] += elapsed
+        totals["max_time"] = max(totals["max_time"], elapsed)
+        if attempt > 0:
+            totals["retries"] += 1
+        if failed:
+            totals["errors"] += 1
+        _recent.append((url, status, elapsed, attempt))
+
+
+def get(url, params=None, timeout=10, **kwargs):
+    """
+    Send a GET request through the shared session with rate limiting and retries.
+    :param url: Request URL.
+    :param params: Dictionary of query parameters.
+    :param timeout: Request timeout in seconds (or a (connect, read) tuple).
+    :param kwargs: Extra arguments passed to requests.Session.get (e.g. stream=True).
+    :return: The final requests.Response (check its status with raise_for_status()).
+    """
+    host = urlparse(url).hostname or ""
+    bucket = _buckets.get(host)
+    for attempt in range(MAX_RETRIES + 1):
+        if bucket is not None:
+            bucket.acquire()  # Wait for our turn within the host's rate limit
+        start = time.monotonic()
+        try:
+            response = session.get(url, params=params, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _record(host, url, None, time.monotonic() - start, attempt, True)
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"Request to {host} failed ({e}), retrying...")
+            time.sleep(_retry_delay(attempt))
+            continue
+
+        failed = response.status_code in RETRY_STATUSES
+        _record(host, url, response.status_code, time.monotonic() - start, attempt, failed)
+        if not failed or attempt == MAX_RETRIES:
+            return response
+        if _server_delay(response) > RETRY_AFTER_MAX:
+            # Not worth blocking on; the caller can serve cached data until the server is back
+            print(f"{host} returned {response.status_code} with Retry-After {response.headers['Retry-After']}, giving up")
+            return response
+        delay = _retry_delay(attempt, response)
+        print(f"{host} returned {response.status_code}, retrying in {delay:.1f}s...")
+        response.close()  # Return the connection to the pool before sleeping
+        time.sleep(delay)
+
+
+def get_json(url, params=None, timeout=10):
+    """
+    Send a GET request and parse the JSON body.
+    :return: Parsed JSON response.
+    """
+    response = get(url, params=params, timeout=timeout)
+    response.raise_for_status()  # Raise an error if the response status is not 200
+    return response.json()
+
+
+def get_stats():
+    """
+    Return request timing statistics.
+    :return: Dictionary with per-host totals (including average time) and a list of recent requests.
+    """
+    with _stats_lock:
+        hosts = {}
+        for host, totals in _stats.items():
+            hosts[host] = dict(totals, avg_time=totals["total_time"] / totals["requests"])
+        return {"hosts": hosts, "recent": list(_recent)}
@@ -0,0 +1,217 @@
+import os  # Import for file management
+import json  # Import to read and write the manifest
+import threading  # Import to share the store between download workers
+
+from atomic_file import atomic_write  # Import for atomic manifest writes
+
+"""
+Image Store
+
+A persistent, content-addressed store for downloaded images. A manifest (manifest.json in the
+output folder) maps each URL to the SHA-256 of its content, and each hash to the file holding it:
+- URLs already in the manifest are skipped on the next run, so interrupted runs resume.
+- Identical content from different URLs is stored once.
+- Optional perceptual hashing (dHash) groups near-duplicates (resized or re-encoded copies) into clusters.
+- URLs whose content fails validation are recorded as rejected so they are not downloaded again.
+
+validate_image() does the CPU-heavy decoding work and is meant to run in a process pool.
+"""
+
+MANIFEST_NAME = "manifest.json"
+# How many new entries to add before the manifest is written to disk again
+SAVE_EVERY = 25
+
+
+def dhash(path, size=8):
+    """
+    Compute a 64-bit difference hash of an image, which stays the same for resized or re-encoded copies.
+    :param path: Path of the image file.
+    :return: The hash as an integer.
+    """
+    from PIL import Image  # Imported here so PIL is only needed when perceptual hashing is enabled
+
+    with Image.open(path) as img:
+        pixels = list(img.convert("L").resize((size + 1, size)).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+# File signatures (magic bytes) and the extension used for each format
+SIGNATURES = [
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"\x00\x00\x01\x00", "ico"),
+]
+# Number of leading bytes needed to detect any supported format
+SNIFF_BYTES = 12
+
+
+def sniff_format(header):
+    """
+    Detect an image format from the first bytes of a file, without decoding it.
+    :param header: At least SNIFF_BYTES leading bytes of the file.
+    :return: File extension (e.g. "jpg"), or None if the bytes are not a supported image.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+def validate_image(path, min_width=0, min_height=0, thumbnail_path=None, thumbnail_size=(256, 256), phash=False):
+    """
+    Check that a file is a complete image of a useful size, optionally writing a thumbnail and
+    computing its perceptual hash. Runs in a worker process, so all decoding happens off the network threads.
+    :param path: Path of the downloaded file.
+    :param min_width: Minimum accepted width in pixels.
+    :param min_height: Minimum accepted height in pixels.
+    :param thumbnail_path: Where to save a JPEG thumbnail, or None to skip it.
+    :param thumbnail_size: Maximum thumbnail width and height.
+    :param phash: Whether to compute the perceptual hash.
+    :return: Dictionary with "ok", "reason", "width", "height" and "phash".
+    """
+    from PIL import Image  # Imported here so only the worker processes load PIL
+
+    result = {"ok": False, "reason": "", "width": 0, "height": 0, "phash": None}
+    try:
+        with Image.open(path) as img:
+            img.verify()  # Structural check without a full decode
+        with Image.open(path) as img:
+            result["width"], result["height"] = img.size
+            if img.width < min_width or img.height < min_height:
+                result["reason"] = f"too small ({img.width}x{img.height})"
+                return result
+            if thumbnail_path is not None:
+                img.thumbnail(thumbnail_size)
+                img.convert("RGB").save(thumbnail_path, "JPEG", quality=85)
+        if phash:
+            result["phash"] = dhash(path)
+    except Exception as e:
+        result["reason"] = f"invalid image ({e})"
+        return result
+    result["ok"] = True
+    return result
+
+
+class ImageStore:
+    def __init__(self, directory, prefix, phash_threshold=6):
+        """
+        :param directory: Folder images and the manifest are stored in.
+        :param prefix: File name prefix for stored images.
+        :param phash_threshold: Maximum number of differing hash bits for two images to count as near-duplicates.
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.phash_threshold = phash_threshold
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        self.manifest = {"urls": {}, "hashes": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.manifest = json.load(file)
+        self.remove_partial_files()
+
+    def remove_partial_files(self):
+        """
+        Delete temporary files left behind by an interrupted run.
+        """
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".part"):
+                os.remove(os.path.join(self.directory, file_name))
+
+    def has_url(self, url):
+        with self.lock:
+            return url in self.manifest["urls"]
+
+    def has_hash(self, sha256):
+        with self.lock:
+            return sha256 in self.manifest["hashes"]
+
+    def reject(self, url, reason):
+        """
+        Record that a URL failed permanently (bad status, not an image or failed validation) so it is skipped on later runs.
+        """
+        with self.lock:
+            self.manifest["urls"][url] = {"rejected": reason}
+            self.unsaved += 1
+
+    def add(self, url, temp_path, sha256, img_format, phash_value=None):
+        """
+        Store a downloaded image, keeping only one copy of identical content.
+        :param url: URL the image was downloaded from.
+        :param temp_path: Temporary file holding the downloaded bytes (moved or deleted).
+        :param sha256: Hex SHA-256 of the file's content.
+        :param img_format: File extension to use if the content is new.
+        :param phash_value: Perceptual hash of the image (see validate_image), used for clustering.
+        :return: Tuple of (stored file name, True if the content was already stored).
+        """
+        with self.lock:
+            entry = self.manifest["hashes"].get(sha256)
+            duplicate = entry is not None
+            if duplicate:
+                os.remove(temp_path)  # Same content already stored under another URL
+            else:
+                file_name = f"{self.prefix}_{sha256[:16]}.{img_format}"
+                os.replace(temp_path, os.path.join(self.directory, file_name))
+                entry = {"file": file_name}
+                self.manifest["hashes"][sha256] = entry
+            self.manifest["urls"][url] = {"sha256": sha256, "file": entry["file"]}
+            self.unsaved += 1
+            save_now = self.unsaved >= SAVE_EVERY
+
+        if phash_value is not None and not duplicate:
+            self.cluster(sha256, phash_value)
+        if save_now:
+            self.save()
+        return entry["file"], duplicate
+
+    def cluster(self, sha256, value):
+        """
+        Assign a newly stored image to a near-duplicate cluster.
+        :param sha256: Hash of the stored image.
+        :param value: Its perceptual hash.
+        """
+        with self.lock:
+            entry = self.manifest["hashes"][sha256]
+            entry["phash"] = f"{value:016x}"
+            entry["cluster"] = sha256
+            for other_hash, other in self.manifest["hashes"].items():
+                if other_hash != sha256 and "phash" in other:
+                    if bin(value ^ int(other["phash"], 16)).count("1") <= self.phash_threshold:
+                        entry["cluster"] = other["cluster"]
+                        print(f"{entry['file']} is a near-duplicate of {other['file']}")
+                        break
+
+    def near_duplicates(self):
+        """
+        Group stored files by perceptual-hash cluster.
+        :return: List of lists of file names, one list per cluster with more than one member.
+        """
+        clusters = {}
+        with self.lock:
+            for entry in self.manifest["hashes"].values():
+                if "cluster" in entry:
+                    clusters.setdefault(entry["cluster"], []).append(entry["file"])
+        return [files for files in clusters.values() if len(files) > 1]
+
+    def save(self):
+        """
+        Write the manifest to disk atomically.
+        """
+        with self.lock:
+            with atomic_write(self.path) as file:
+                json.dump(self.manifest, file, indent=1)
+            self.unsaved = 0
@@ -0,0 +1,313 @@
+import os  # Import for the METRICS_FILE / METRICS_PORT / FETCH_PROFILE settings
+import time  # Import for timers
+import bisect  # Import to find histogram buckets
+import pstats  # Import to merge and save profiles
+import cProfile  # Import for one-cycle profile captures
+import threading  # Import to make metrics thread-safe
+from contextlib import contextmanager  # Import for timer and profile context managers
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Import for the local metrics endpoint
+
+from atomic_file import atomic_write  # Import for atomic metrics file writes
+
+"""
+Metrics
+
+Counters and latency histograms for the refresh hot paths (source fetches, response parsing,
+cache lookups, HTTP requests and dashboard updates), exported in the Prometheus text format:
+- METRICS_FILE=<path> writes the metrics to a file after every refresh cycle
+  (e.g. for node_exporter's textfile collector).
+- METRICS_PORT=<port> serves them at http://127.0.0.1:<port>/metrics.
+- FETCH_PROFILE=<path> captures a cProfile of the next refresh cycle and saves it to <path>
+  (open it with `python -m pstats <path>`). request_profile() does the same from code.
+
+Usage:
+    with metrics.timer(metrics.SOURCE_SECONDS, source="crypto"):
+        ...
+    metrics.CACHE_REQUESTS.inc(result="hit")
+"""
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond parsing up to slow network sources
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_text(labels):
+    """
+    Format a label set, e.g. {source="crypto"}.
+    :param labels: Tuple of (name, value) pairs.
+    """
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        # Escape backslashes, quotes and newlines as the exposition format requires
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{text}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        """
+        :param name: Metric name (e.g. "fetch_source_total").
+        :param help_text: Description shown in the exported HELP line.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.values = {}  # Sorted label tuple -> count
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter for a label set.
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """
+        :param name: Metric name (e.g. "fetch_source_seconds").
+        :param help_text: Description shown in the exported HELP line.
+        :param buckets: Ascending bucket upper bounds.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # Sorted label tuple -> [per-bucket counts (+Inf last), sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record one observation for a label set.
+        """
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)  # First bucket whose bound is >= value
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(key)} {count}")
+        return lines
+
+
+_registry = []
+
+
+def counter(name, help_text):
+    """
+    Create and register a counter.
+    """
+    metric = Counter(name, help_text)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """
+    Create and register a histogram.
+    """
+    metric = Histogram(name, help_text, buckets)
+    _registry.append(metric)
+    return metric
+
+
+@contextmanager
+def timer(metric, **labels):
+    """
+    Time a block and record its duration in a histogram.
+    :param metric: Histogram to record into.
+    :param labels: Label values for the observation.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+# Metrics recorded by the fetch code, the cache, the HTTP client and the dashboard
+SOURCE_SECONDS = histogram("fetch_source_seconds", "Time taken by each data source in a refresh.")
+SOURCE_TOTAL = counter("fetch_source_total", "Data source results by status (ok, error or timeout).")
+PARSE_SECONDS = histogram("fetch_parse_seconds", "Time spent turning API responses into Quote records.")
+CACHE_REQUESTS = counter("quote_cache_requests_total", "Quote cache lookups by result (hit, stale, shared, miss or fallback).")
+HTTP_SECONDS = histogram("http_request_seconds", "HTTP request latency per host, including failed attempts.")
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests per host and status.")
+CYCLE_SECONDS = histogram("refresh_cycle_seconds", "Time taken by a full refresh cycle.")
+UI_UPDATE_SECONDS = histogram("gui_update_seconds", "Time taken applying a snapshot to the dashboard.")
+
+
+def render():
+    """
+    Format every registered metric in the Prometheus text exposition format.
+    :return: The metrics as a string.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """
+    Write the metrics to a file atomically, so a scraper never reads a partial file.
+    :param path: File to write.
+    """
+    with atomic_write(path) as file:
+        file.write(render())
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the console
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """
+    Serve the metrics at http://<host>:<port>/metrics on a daemon thread.
+    :param port: Port to listen on (0 picks a free port).
+    :param host: Address to bind to; localhost by default so the endpoint is not exposed.
+    :return: The running ThreadingHTTPServer.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_exporter():
+    """
+    Start whichever exporters are configured through METRICS_PORT and FETCH_PROFILE.
+    Call once when a long-running program (dashboard or alerter) starts.
+    """
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        server = start_http_server(int(port))
+        print(f"Serving metrics on http://127.0.0.1:{server.server_port}/metrics")
+    if os.environ.get("FETCH_PROFILE"):
+        request_profile(os.environ["FETCH_PROFILE"])
+
+
+def cycle_finished():
+    """
+    Report that a refresh cycle has finished, writing the metrics file if METRICS_FILE is set.
+    """
+    path = os.environ.get("METRICS_FILE")
+    if path:
+        try:
+            write_textfile(path)
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+
+
+_profile_path = None  # Where the next cycle's profile is saved, if one was requested
+_capture = None  # Profiles collected for the cycle being captured
+_profile_lock = threading.Lock()
+
+
+def request_profile(path):
+    """
+    Capture a cProfile of the next refresh cycle.
+    :param path: File the combined profile is saved to.
+    """
+    global _profile_path
+    with _profile_lock:
+        _profile_path = path
+
+
+@contextmanager
+def profile_cycle():
+    """
+    Profile the enclosed refresh cycle if a capture was requested; otherwise does nothing.
+    Work handed to other threads is included when wrapped with profiled().
+    """
+    global _profile_path, _capture
+    with _profile_lock:
+        path, _profile_path = _profile_path, None
+        if path is not None:
+            _capture = []
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler (e.g. python -m cProfile) is already running
+        with _profile_lock:
+            _capture = None
+        print(f"Profile not captured: {e}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _profile_lock:
+            profiles, _capture = _capture, None
+        stats = pstats.Stats(profiler)
+        for other in profiles:
+            stats.add(other)
+        stats.dump_stats(path)
+        print(f"Profile of one refresh cycle saved to {path}")
+
+
+def profiled(func):
+    """
+    Wrap a function run on another thread so it is included in the current profile capture.
+    Python 3.12+ allows only one active profiler, so there the thread runs unprofiled and the
+    capture holds the calling thread only.
+    :return: The wrapped function, or func unchanged when no capture is running.
+    """
+    with _profile_lock:
+        profiles = _capture
+    if profiles is None:
+        return func
+
+    def run(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return func(*args, **kwargs)  # The cycle's profiler is already active
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with _profile_lock:
+                profiles.append(profiler)
+
+    return run
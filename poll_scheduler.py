@@ -0,0 +1,345 @@
+import os  # Import for the FETCH_REQUEST_BUDGET and FETCH_BUDGET_FILE settings
+import sys  # Import to pick the file locking call by platform
+import json  # Import to store the shared request budget
+import math  # Import for volatility estimates
+import time  # Import for due times and the request budget
+import tempfile  # Import for the default budget file location
+import threading  # Import so consumers can update priorities from any thread
+from contextlib import contextmanager  # Import for holding the request budget
+
+if sys.platform == "win32":
+    import msvcrt  # Import to lock the budget file on Windows
+else:
+    import fcntl  # Import to lock the budget file elsewhere
+
+from watchlist import MAX_IDS_PER_REQUEST, MAX_IDS_LENGTH  # Import to cost CoinGecko requests the way they are chunked
+
+"""
+Poll Scheduler
+
+Decides which assets to refresh and when, instead of refreshing everything on a fixed timer:
+- Each asset gets its own refresh interval from its recent volatility: the interval is roughly the
+  time its price is expected to take to move by TARGET_MOVE, clamped between MIN_INTERVAL and MAX_INTERVAL.
+- Assets on screen or referenced by alert rules are refreshed more often (PRIORITY_FACTOR each).
+- Every refresh spends from a fixed requests-per-minute budget (FETCH_REQUEST_BUDGET, default 20).
+  When the budget is short the most overdue, highest-priority assets go first; the rest wait.
+- The budget is kept in a locked file (FETCH_BUDGET_FILE, in the temp folder by default), so a
+  dashboard and an alerter running side by side share one budget instead of spending one each.
+  Set FETCH_BUDGET_FILE to an empty string to keep the budget per process.
+- Assets that are nearly due ride along in a CoinGecko chunk that is being sent anyway, for free.
+
+Usage:
+    scheduler = PollScheduler()
+    scheduler.add_assets(CRYPTO_COINS, STOCKS)
+    coins, stocks = scheduler.select()      # What to fetch now
+    scheduler.observe(quotes)               # Feed the results back in
+    time.sleep(scheduler.next_delay())      # When to ask again
+"""
+
+# Requests per minute shared by every asset polled by any scheduler on this machine
+REQUEST_BUDGET = float(os.environ.get("FETCH_REQUEST_BUDGET", 20))
+# File holding the budget shared between processes
+BUDGET_FILE = os.environ.get("FETCH_BUDGET_FILE", os.path.join(tempfile.gettempdir(), "fetch_request_budget.json"))
+# Bounds on any asset's refresh interval, in seconds
+MIN_INTERVAL = 10
+MAX_INTERVAL = 120
+# Price move (as a fraction) an asset may make between refreshes
+TARGET_MOVE = 0.001
+# Interval multiplier for assets that are visible or alert-relevant (applied once for each)
+PRIORITY_FACTOR = 0.5
+# Weight of the newest observation in the volatility average
+VOLATILITY_ALPHA = 0.3
+# Assets due within this fraction of their interval may join a request that is sent anyway
+PIGGYBACK_FRACTION = 0.5
+
+
+def _lock_file(file):
+    file.seek(0)
+    if sys.platform == "win32":
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(file):
+    file.seek(0)
+    if sys.platform == "win32":
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class RequestBudget:
+    """Token bucket of requests, optionally kept in a file so several processes draw from the same budget."""
+
+    def __init__(self, budget_per_minute=REQUEST_BUDGET, path=None):
+        """
+        :param budget_per_minute: Requests allowed per minute.
+        :param path: File shared by every process using the budget, or None to keep it in this process.
+        """
+        self.fill_rate = budget_per_minute / 60  # Requests earned per second
+        self.capacity = max(1.0, budget_per_minute / 4)  # Allow short bursts, never a whole minute's worth
+        self.path = path
+        self.state = {"tokens": self.capacity, "updated": time.time()}
+
+    @contextmanager
+    def hold(self):
+        """
+        Refill the budget and hold it (locking the file, if any) while the caller spends from it.
+        Callers in one process must serialise their use of hold().
+        :return: Context manager yielding a dictionary whose "tokens" entry the caller may reduce.
+        """
+        file = self._open()
+        try:
+            if file is not None:
+                self.state = self._read(file) or self.state
+            now = time.time()
+            elapsed = max(0.0, now - self.state["updated"])  # Wall-clock time, so it means the same in every process
+            self.state["tokens"] = min(self.capacity, self.state["tokens"] + elapsed * self.fill_rate)
+            self.state["updated"] = now
+            yield self.state
+            if file is not None:
+                file.seek(0)
+                file.truncate()
+                json.dump(self.state, file)
+                file.flush()
+        finally:
+            if file is not None:
+                _unlock_file(file)
+                file.close()
+
+    def _open(self):
+        """
+        Open and lock the budget file.
+        :return: The open file, or None to use the in-process budget.
+        """
+        if self.path is None:
+            return None
+        file = None
+        try:
+            file = open(self.path, "a+", encoding="utf-8")
+            _lock_file(file)
+            return file
+        except OSError as e:
+            if file is not None:
+                file.close()
+            print(f"Error opening request budget file, using a per-process budget: {e}")
+            return None
+
+    def _read(self, file):
+        """
+        Read the shared budget.
+        :return: Dictionary with "tokens" and "updated", or None if the file is new or unreadable.
+        """
+        file.seek(0)
+        try:
+            state = json.loads(file.read())
+            return {"tokens": float(state["tokens"]), "updated": float(state["updated"])}
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+class ChunkCounter:
+    """Counts the CoinGecko requests a growing list of IDs needs, packing them like watchlist.chunk_ids()."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.ids = 0  # IDs in the last chunk
+        self.length = 0  # Joined length of the last chunk
+
+    def _starts_chunk(self, coin_id):
+        added = len(coin_id) + 1  # Including the joining comma
+        return self.ids == 0 or self.ids >= MAX_IDS_PER_REQUEST or self.length + added > MAX_IDS_LENGTH
+
+    def cost_with(self, coin_id):
+        """
+        Number of requests needed if coin_id were added.
+        """
+        return self.chunks + (1 if self._starts_chunk(coin_id) else 0)
+
+    def add(self, coin_id):
+        if self._starts_chunk(coin_id):
+            self.chunks += 1
+            self.ids, self.length = 1, len(coin_id)
+        else:
+            self.ids += 1
+            self.length += len(coin_id) + 1
+
+
+class PollScheduler:
+    def __init__(self, budget_per_minute=REQUEST_BUDGET, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 budget_file=BUDGET_FILE):
+        """
+        :param budget_per_minute: Requests allowed per minute across every asset.
+        :param min_interval: Shortest refresh interval in seconds.
+        :param max_interval: Longest refresh interval in seconds.
+        :param budget_file: File sharing the budget with other processes, or None/"" for a budget of our own.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = RequestBudget(budget_per_minute, budget_file or None)
+        self.assets = {}  # name -> state dictionary
+        self.lock = threading.Lock()
+
+    def add_assets(self, coins=None, stocks=None):
+        """
+        Start scheduling assets; new assets are due immediately.
+        :param coins: Dictionary mapping CoinGecko ID to display name.
+        :param stocks: Dictionary mapping display name to Yahoo Finance ticker.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for symbol, name in (coins or {}).items():
+                self._add(name, "crypto", symbol, now)
+            for name, ticker in (stocks or {}).items():
+                self._add(name, "stock", ticker, now)
+
+    def _add(self, name, kind, symbol, now):
+        if name not in self.assets:
+            self.assets[name] = {
+                "kind": kind,
+                "symbol": symbol,
+                "volatility": 0.0,  # Typical fractional move per minute
+                "price": None,
+                "seen_at": None,
+                "visible": False,
+                "alert": False,
+                "due": now,
+            }
+
+    def set_visible(self, names):
+        """
+        Mark which assets are currently on screen (all others are not).
+        :param names: Iterable of asset names.
+        """
+        names = set(names)
+        with self.lock:
+            for name, state in self.assets.items():
+                self._set_flag(state, "visible", name in names)
+
+    def set_alert_assets(self, symbols):
+        """
+        Mark which assets are referenced by alert rules.
+        :param symbols: Iterable of CoinGecko IDs or tickers.
+        """
+        symbols = set(symbols)
+        with self.lock:
+            for state in self.assets.values():
+                self._set_flag(state, "alert", state["symbol"] in symbols)
+
+    def _set_flag(self, state, flag, value):
+        if state[flag] != value:
+            state[flag] = value
+            if value and state["seen_at"] is not None:
+                # Pull the next refresh forward to the new, shorter interval
+                state["due"] = min(state["due"], state["seen_at"] + self._interval(state))
+
+    def _interval(self, state):
+        """
+        Refresh interval for an asset, in seconds.
+        """
+        if state["volatility"] > 0:
+            # With moves of v per minute, a move of TARGET_MOVE takes about (TARGET_MOVE / v)^2 minutes
+            interval = 60 * (TARGET_MOVE / state["volatility"]) ** 2
+        else:
+            interval = self.max_interval
+        for flag in ("visible", "alert"):
+            if state[flag]:
+                interval *= PRIORITY_FACTOR
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def observe(self, quotes):
+        """
+        Record fetched quotes, updating each asset's volatility and next due time.
+        :param quotes: Dictionary mapping asset name to Quote.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for name, quote in (quotes or {}).items():
+                state = self.assets.get(name)
+                if state is None or not quote.price > 0:
+                    continue
+                if state["price"] is not None and now > state["seen_at"]:
+                    minutes = (now - state["seen_at"]) / 60
+                    # Scale the move to a per-minute figure (random-walk moves grow with the square root of time)
+                    move = abs(math.log(quote.price / state["price"])) / math.sqrt(max(minutes, 1 / 60))
+                    state["volatility"] += VOLATILITY_ALPHA * (move - state["volatility"])
+                elif quote.change_24hr == quote.change_24hr:
+                    # First sighting: estimate from the 24-hour change until we have our own samples
+                    state["volatility"] = abs(quote.change_24hr) / 100 / math.sqrt(24 * 60)
+                state["price"] = quote.price
+                state["seen_at"] = now
+                state["due"] = now + self._interval(state)
+
+    def _urgency(self, state, now):
+        """
+        How overdue an asset is relative to its interval; higher is refreshed first.
+        """
+        return (now - state["due"]) / self._interval(state) + state["visible"] + state["alert"]
+
+    def select(self):
+        """
+        Pick the assets to fetch now and spend the requests they need from the budget.
+        :return: Tuple of (coins {id: name}, stocks {name: ticker}); both empty if nothing is due
+                 or the budget is spent.
+        """
+        now = time.monotonic()
+        with self.lock, self.budget.hold() as budget:
+            due = [name for name, state in self.assets.items() if state["due"] <= now]
+            due.sort(key=lambda name: self._urgency(self.assets[name], now), reverse=True)
+
+            coins = {}
+            stocks = {}
+            counter = ChunkCounter()
+            for name in due:
+                state = self.assets[name]
+                if state["kind"] == "crypto":
+                    cost = counter.cost_with(state["symbol"]) + (1 if stocks else 0)
+                else:
+                    cost = counter.chunks + 1
+                if cost > budget["tokens"]:
+                    continue  # Would overspend; a coin that fits in an open chunk may still be taken
+                if state["kind"] == "crypto":
+                    counter.add(state["symbol"])
+                    coins[state["symbol"]] = name
+                else:
+                    stocks[name] = state["symbol"]
+
+            if coins:
+                self._piggyback(coins, counter, now)
+            budget["tokens"] -= counter.chunks + (1 if stocks else 0)
+            # Not fetched again until the results come back (observe) or a retry interval passes
+            for name in list(coins.values()) + list(stocks):
+                self.assets[name]["due"] = now + self.min_interval
+            return coins, stocks
+
+    def _piggyback(self, coins, counter, now):
+        """
+        Fill the spare room in the CoinGecko chunks being sent with coins that are nearly due.
+        """
+        nearly_due = [
+            (state["due"], name) for name, state in self.assets.items()
+            if state["kind"] == "crypto" and state["symbol"] not in coins
+            and state["due"] - now <= self._interval(state) * PIGGYBACK_FRACTION
+        ]
+        for _, name in sorted(nearly_due):
+            symbol = self.assets[name]["symbol"]
+            if counter.cost_with(symbol) > counter.chunks:
+                break  # Would need another request
+            counter.add(symbol)
+            coins[symbol] = name
+
+    def next_delay(self):
+        """
+        Seconds until the next asset is due (or until the budget allows another request).
+        """
+        now = time.monotonic()
+        with self.lock:
+            if not self.assets:
+                return float(self.max_interval)
+            delay = min(state["due"] for state in self.assets.values()) - now
+            with self.budget.hold() as budget:
+                tokens = budget["tokens"]
+            if tokens < 1:
+                delay = max(delay, (1 - tokens) / self.budget.fill_rate)
+            return max(0.0, delay)
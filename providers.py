@@ -0,0 +1,268 @@
+import os  # Import for recording folders and the FETCH_PROVIDER setting
+import json  # Import to save and load recorded responses
+import random  # Import for deterministic synthetic responses
+import hashlib  # Import to turn request keys into file names
+import threading  # Import to guard lazy provider creation
+from urllib.parse import urlencode, urlparse  # Import to build request keys and stand-in URLs
+
+import requests  # Import so replay misses look like network errors to existing handlers
+
+import http_client  # Import the shared HTTP client for live requests
+from atomic_file import atomic_write  # Import for atomic writes of recordings
+
+"""
+Data Providers
+
+Every network read in fetch_prices, crypto_alert and crypto_charts goes through a provider:
+- LiveProvider talks to CoinGecko and Yahoo Finance, or to a local stand-in server (see standin_server.py).
+- RecordingProvider wraps another provider and saves every response to a folder.
+- ReplayProvider answers from such a folder without touching the network.
+- SyntheticProvider generates deterministic responses for any watchlist (for tests and benchmarks).
+
+The active provider is chosen with the FETCH_PROVIDER environment variable:
+    live (default), record:<folder>, replay:<folder> or standin:<base url>
+or set in code with set_provider().
+
+Stock quotes are keyed under the pseudo-URL STOCK_QUOTES_URL so they can be recorded,
+replayed and served by the stand-in server like any JSON endpoint.
+"""
+
+# Pseudo-URL used to key batched stock quotes
+STOCK_QUOTES_URL = "yfinance://quotes"
+# Quote fields read from each stock's latest daily bar
+STOCK_FIELDS = ["Close", "High", "Low", "Volume"]
+
+
+class ReplayMissError(requests.exceptions.RequestException):
+    """Raised when a replayed request has no recording."""
+
+
+def request_key(url, params=None):
+    """
+    Build a canonical key for a request.
+    :param url: Endpoint URL.
+    :param params: Dictionary of query parameters.
+    :return: String key that is identical for identical requests regardless of parameter order.
+    """
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+def recording_path(directory, key):
+    """
+    Get the file a recording for a request key is stored in.
+    """
+    return os.path.join(directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def standin_url(base_url, url):
+    """
+    Rewrite a real URL so it is served by the stand-in server: scheme://host/path -> base_url/scheme/host/path.
+    """
+    parsed = urlparse(url)
+    return f"{base_url.rstrip('/')}/{parsed.scheme}/{parsed.netloc}{parsed.path}"
+
+
+class LiveProvider:
+    def __init__(self, base_url=None):
+        """
+        :param base_url: Optional stand-in server address (e.g. "http://127.0.0.1:8765") that replaces the real APIs.
+        """
+        self.base_url = base_url
+
+    def get_json(self, url, params=None, timeout=10):
+        """
+        Fetch a JSON endpoint.
+        :return: Parsed JSON response.
+        """
+        if self.base_url:
+            url = standin_url(self.base_url, url)
+        return http_client.get_json(url, params=params, timeout=timeout)
+
+    def get_stock_quotes(self, tickers):
+        """
+        Fetch the latest daily bar for many tickers.
+        All tickers are requested in one batch; only tickers missing from the batch are fetched individually.
+        :param tickers: List of Yahoo Finance tickers.
+        :return: Dictionary mapping ticker to {"Close", "High", "Low", "Volume"} for tickers that returned data.
+        """
+        if self.base_url:
+            return self.get_json(STOCK_QUOTES_URL, {"tickers": ",".join(tickers)})
+
+        # Fetch every ticker in a single bulk request
+        quotes = self._download_stock_quotes(tickers)
+        for ticker in tickers:
+            if ticker not in quotes:
+                # Fall back to a per-symbol request for tickers the batch did not return
+                try:
+                    quote = self._fetch_single_stock_quote(ticker)
+                except Exception as e:
+                    print(f"Error fetching stock data for {ticker}: {e}")
+                    quote = None
+                if quote is not None:
+                    quotes[ticker] = quote
+        # Plain floats so the quotes can be recorded as JSON
+        return {ticker: {field: float(value) for field, value in quote.items()} for ticker, quote in quotes.items()}
+
+    def _download_stock_quotes(self, tickers):
+        """
+        Fetch the latest daily bar for many tickers in one bulk Yahoo Finance request.
+        """
+        import yfinance as yf  # Imported on first use; yfinance and pandas take a long time to load
+        frame = yf.download(tickers, period="1d", group_by="column", progress=False, threads=True)
+        if frame is None or frame.empty:
+            return {}
+
+        # Take the last available value of every (field, ticker) column in one vectorized step
+        latest = frame.ffill().iloc[-1]
+        if frame.columns.nlevels == 1:
+            # Older yfinance versions return flat columns when only one ticker is requested
+            table = latest.to_frame(name=tickers[0]).T
+        else:
+            table = latest.unstack(level=0)  # Rows are tickers, columns are fields
+        table = table.reindex(columns=STOCK_FIELDS).dropna(subset=["Close"])
+        return table.to_dict(orient="index")
+
+    def _fetch_single_stock_quote(self, ticker):
+        """
+        Fetch the latest daily bar for one ticker; used only when the bulk request misses it.
+        """
+        import yfinance as yf
+        stock_data = yf.Ticker(ticker).history(period="1d")  # Fetch the latest day's data
+        if stock_data.empty:
+            return None
+        return stock_data[STOCK_FIELDS].iloc[-1].to_dict()
+
+
+class RecordingProvider:
+    def __init__(self, directory, inner=None):
+        """
+        :param directory: Folder the responses are saved in (created if missing).
+        :param inner: Provider that performs the real requests (defaults to LiveProvider).
+        """
+        self.directory = directory
+        self.inner = inner or LiveProvider()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_json(self, url, params=None, timeout=10):
+        value = self.inner.get_json(url, params=params, timeout=timeout)
+        self._save(request_key(url, params), value)
+        return value
+
+    def get_stock_quotes(self, tickers):
+        value = self.inner.get_stock_quotes(tickers)
+        self._save(request_key(STOCK_QUOTES_URL, {"tickers": ",".join(tickers)}), value)
+        return value
+
+    def _save(self, key, value):
+        # Written atomically so a replay never reads a partial recording
+        with atomic_write(recording_path(self.directory, key)) as file:
+            json.dump({"key": key, "value": value}, file)
+
+
+class ReplayProvider:
+    def __init__(self, directory):
+        """
+        :param directory: Folder of responses saved by RecordingProvider.
+        """
+        self.directory = directory
+
+    def get_json(self, url, params=None, timeout=10):
+        return self._load(request_key(url, params))
+
+    def get_stock_quotes(self, tickers):
+        return self._load(request_key(STOCK_QUOTES_URL, {"tickers": ",".join(tickers)}))
+
+    def _load(self, key):
+        try:
+            with open(recording_path(self.directory, key), "r", encoding="utf-8") as file:
+                return json.load(file)["value"]
+        except FileNotFoundError:
+            raise ReplayMissError(f"No recording for {key}")
+
+
+class SyntheticProvider:
+    """Generates deterministic CoinGecko and Yahoo responses for any watchlist."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def get_json(self, url, params=None, timeout=10):
+        if url.endswith("/exchange_rates"):
+            values = {"btc": 1.0, "usd": 60000.0, "gbp": 47000.0, "eur": 55000.0, "jpy": 9000000.0}
+            return {"rates": {code: {"value": value} for code, value in values.items()}}
+        rng = random.Random(f"{self.seed}:{params.get('ids', '')}")
+        return {
+            coin_id: {
+                "usd": rng.uniform(0.01, 50000),
+                "usd_24h_change": rng.gauss(0, 5),
+                "usd_7d_change": rng.gauss(0, 10),
+            }
+            for coin_id in params["ids"].split(",")
+        }
+
+    def get_stock_quotes(self, tickers):
+        rng = random.Random(f"{self.seed}:{','.join(tickers)}")
+        quotes = {}
+        for ticker in tickers:
+            close = rng.uniform(1, 500)
+            quotes[ticker] = {"Close": close, "High": close * 1.02, "Low": close * 0.98, "Volume": rng.uniform(1e4, 1e7)}
+        return quotes
+
+
+def load_recordings(directory):
+    """
+    Load every recording in a folder.
+    :param directory: Folder of responses saved by RecordingProvider.
+    :return: Dictionary mapping request key to recorded value.
+    """
+    recordings = {}
+    for file_name in os.listdir(directory):
+        if file_name.endswith(".json"):
+            with open(os.path.join(directory, file_name), "r", encoding="utf-8") as file:
+                payload = json.load(file)
+            recordings[payload["key"]] = payload["value"]
+    return recordings
+
+
+def provider_from_setting(setting):
+    """
+    Create a provider from a FETCH_PROVIDER style setting.
+    :param setting: "live", "record:<folder>", "replay:<folder>" or "standin:<base url>".
+    :return: Provider instance.
+    """
+    mode, _, argument = setting.partition(":")
+    if mode == "live":
+        return LiveProvider()
+    if mode == "record":
+        return RecordingProvider(argument)
+    if mode == "replay":
+        return ReplayProvider(argument)
+    if mode == "standin":
+        return LiveProvider(base_url=argument)
+    raise ValueError(f"Unknown FETCH_PROVIDER setting: {setting}")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Get the active provider, creating it from FETCH_PROVIDER on first use.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_from_setting(os.environ.get("FETCH_PROVIDER", "live"))
+        return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the active provider (e.g. with a ReplayProvider for benchmarks).
+    """
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,222 @@
+import os  # Import for the on-disk cache directory
+import json  # Import to store cached responses on disk
+import time  # Import for entry timestamps
+import hashlib  # Import to turn cache keys into file names
+import tempfile  # Import for the default cache directory
+import threading  # Import for locking and background revalidation
+from collections import OrderedDict  # Import for the least-recently-used size bound
+from concurrent.futures import Future  # Import to share one in-flight request between callers
+
+import metrics  # Import to count cache hits and misses
+from providers import get_provider, request_key  # Import the data provider used on a cache miss
+from atomic_file import atomic_write  # Import for atomic cache file writes
+
+"""
+Quote Cache
+
+A small shared cache for API responses, keyed by endpoint and parameters:
+- Entries are fresh for `ttl` seconds; the cache holds at most `max_entries` entries.
+- Identical requests made at the same time share a single network call.
+- Stale-while-revalidate: an entry older than `ttl` but younger than `stale_ttl` is returned
+  immediately while a background thread refreshes it.
+- If loading fails (e.g. the API is rate limiting us), the last cached value is served whatever its age.
+- Optional on-disk backing (one JSON file per key) lets separate processes share the cache.
+  Set the FETCH_CACHE_DIR environment variable to choose the folder, or to an empty string to disable it.
+"""
+
+# Default number of seconds an entry is considered fresh
+DEFAULT_TTL = 30
+# Default number of seconds a stale entry may still be served while it is refreshed
+DEFAULT_STALE_TTL = 300
+# Default maximum number of entries kept in memory
+DEFAULT_MAX_ENTRIES = 256
+# Folder used to share cached responses between processes
+DISK_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fetch_quote_cache"))
+
+
+def make_key(url, params=None):
+    """
+    Build a canonical cache key from an endpoint and its parameters.
+    :param url: Endpoint URL.
+    :param params: Dictionary of query parameters.
+    :return: String key that is identical for identical requests regardless of parameter order.
+    """
+    return request_key(url, params)
+
+
+class QuoteCache:
+    def __init__(self, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None):
+        """
+        :param ttl: Seconds an entry is fresh.
+        :param stale_ttl: Seconds an entry may be served stale while it is refreshed in the background.
+        :param max_entries: Maximum number of entries kept in memory.
+        :param disk_dir: Optional folder for sharing entries between processes.
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self.entries = OrderedDict()  # key -> (stored_at, value), oldest first
+        self.in_flight = {}  # key -> Future shared by every caller waiting on that key
+        self.lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key, loader, ttl=None):
+        """
+        Return the cached value for a key, loading it if needed.
+        :param key: Cache key (see make_key).
+        :param loader: Zero-argument function that fetches a fresh value.
+        :param ttl: Optional override of the freshness window for this call.
+        :return: The cached or freshly loaded value.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        entry = self._lookup(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                metrics.CACHE_REQUESTS.inc(result="hit")
+                return value  # Fresh hit
+            if age < self.stale_ttl:
+                # Serve the stale value now and refresh it in the background
+                metrics.CACHE_REQUESTS.inc(result="stale")
+                self._refresh_in_background(key, loader)
+                return value
+
+        # Missing or too old to serve: load it, sharing the request with any concurrent callers
+        future, is_owner = self._claim(key)
+        metrics.CACHE_REQUESTS.inc(result="miss" if is_owner else "shared")
+        if is_owner:
+            self._load(key, loader, future)
+        try:
+            return future.result()
+        except Exception as e:
+            if entry is None:
+                raise
+            # The source is down or rate limited: an old value beats no value
+            metrics.CACHE_REQUESTS.inc(result="fallback")
+            print(f"Error loading fresh data, serving a cached copy from {time.time() - entry[0]:.0f}s ago: {e}")
+            return entry[1]
+
+    def get_json(self, url, params=None, ttl=None, timeout=10):
+        """
+        Fetch a JSON endpoint through the cache.
+        :param url: Endpoint URL.
+        :param params: Dictionary of query parameters.
+        :param ttl: Optional override of the freshness window for this call.
+        :param timeout: Request timeout in seconds.
+        :return: Parsed JSON response.
+        """
+        return self.get(make_key(url, params), lambda: get_provider().get_json(url, params, timeout=timeout), ttl=ttl)
+
+    def peek(self, url, params=None):
+        """
+        Return the cached response for a request whatever its age, without touching the network.
+        :param url: Endpoint URL.
+        :param params: Dictionary of query parameters.
+        :return: The cached value, or None if nothing is cached.
+        """
+        entry = self._lookup(make_key(url, params))
+        return None if entry is None else entry[1]
+
+    def clear(self):
+        """
+        Remove every entry from memory (the on-disk copy is left for other processes).
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def _lookup(self, key):
+        """
+        Find an entry in memory, falling back to the on-disk copy.
+        :return: Tuple of (stored_at, value) or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)  # Mark as recently used
+        if self.disk_dir:
+            disk_entry = self._read_disk(key)
+            # Another process may have stored a newer copy on disk
+            if disk_entry is not None and (entry is None or disk_entry[0] > entry[0]):
+                self._store(key, disk_entry, write_disk=False)
+                entry = disk_entry
+        return entry
+
+    def _store(self, key, entry, write_disk=True):
+        """
+        Save an entry in memory (evicting the least recently used if full) and optionally on disk.
+        """
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if write_disk and self.disk_dir:
+            self._write_disk(key, entry)
+
+    def _claim(self, key):
+        """
+        Get the in-flight future for a key, creating it if nobody is loading the key yet.
+        :return: Tuple of (future, True if the caller must perform the load).
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self.in_flight[key] = future
+            return future, True
+
+    def _load(self, key, loader, future):
+        """
+        Run the loader, store its result and wake every caller waiting on the key.
+        """
+        try:
+            value = loader()
+            self._store(key, (time.time(), value))
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def _refresh_in_background(self, key, loader):
+        """
+        Start a background refresh of a key unless one is already running.
+        """
+        future, is_owner = self._claim(key)
+        if not is_owner:
+            return
+        threading.Thread(target=self._background_load, args=(key, loader, future), daemon=True).start()
+
+    def _background_load(self, key, loader, future):
+        self._load(key, loader, future)
+        if future.exception() is not None:
+            # Nobody is waiting on a background refresh, so report the failure here
+            print(f"Error refreshing cached data: {future.exception()}")
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as file:
+                payload = json.load(file)
+            return payload["stored_at"], payload["value"]
+        except (OSError, ValueError, KeyError):
+            return None  # Missing or partially written file
+
+    def _write_disk(self, key, entry):
+        # Written atomically so other processes never read a partial entry
+        try:
+            with atomic_write(self._disk_path(key)) as file:
+                json.dump({"key": key, "stored_at": entry[0], "value": entry[1]}, file)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error writing cache file: {e}")
+
+
+# Shared cache used by the dashboard, alerts and charts
+quote_cache = QuoteCache(disk_dir=DISK_CACHE_DIR)
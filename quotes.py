@@ -0,0 +1,185 @@
+import math  # Import for NaN checks
+import time  # Import for snapshot timestamps
+import struct  # Import for the compact binary snapshot format
+import numbers  # Import to accept NumPy as well as built-in numbers
+from dataclasses import dataclass  # Import to define compact quote records
+
+from atomic_file import atomic_write  # Import for atomic snapshot writes
+
+"""
+Quotes
+
+Typed quote records returned by the fetch layer. Values are plain floats with NaN for
+anything missing, so they can be sorted, compared and aggregated directly. Text formatting
+happens only at display time through the format_* helpers below.
+
+Snapshots (a dictionary of quotes keyed by asset name) can be packed into a compact binary
+format with encode_snapshot(), used by the fetch daemon and by the dashboard's saved snapshot.
+"""
+
+NAN = float("nan")
+
+# Symbols used when formatting prices in each currency
+CURRENCY_SYMBOLS = {"gbp": "£", "usd": "$", "eur": "€", "jpy": "¥"}
+
+# Numeric fields of a Quote, in the order used by snapshot_arrays()
+NUMERIC_FIELDS = ("price", "change_24hr", "change_7d", "high", "low", "volume")
+
+# Binary snapshot format (see encode_snapshot), shared by the fetch daemon and the dashboard's warm start:
+#   header: magic b"QSNP", version (uint16), timestamp (float64), quote count (uint32)
+#   quote:  kind (uint8), currency (3 ASCII bytes), the NUMERIC_FIELDS (6 x float64),
+#           then the symbol and the name, each as a uint16 length and UTF-8 bytes
+SNAPSHOT_MAGIC = b"QSNP"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sHdI")
+QUOTE = struct.Struct("<B3s6d")
+STRING_LENGTH = struct.Struct("<H")
+# Quote kinds in the binary format
+KINDS = ["crypto", "stock"]
+
+
+@dataclass(slots=True)
+class Quote:
+    symbol: str  # CoinGecko ID or Yahoo Finance ticker
+    name: str  # Display name
+    kind: str  # "crypto" or "stock"
+    currency: str  # Currency code of price, high and low (e.g. "gbp")
+    price: float = NAN
+    change_24hr: float = NAN  # Percentage change over 24 hours
+    change_7d: float = NAN  # Percentage change over 7 days
+    high: float = NAN
+    low: float = NAN
+    volume: float = NAN
+
+
+def to_float(value):
+    """
+    Convert an API value to a float.
+    :param value: Number (or anything else) from an API response.
+    :return: The value as a float, or NaN if it is missing or not numeric.
+    """
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return NAN
+    return float(value)
+
+
+def format_price(value, currency="gbp"):
+    """
+    Format a price for display.
+    :param value: Price as a float (NaN if missing).
+    :param currency: Currency code used to pick the symbol.
+    :return: Text such as "£12345.67", or "N/A" if the price is missing.
+    """
+    if math.isnan(value):
+        return "N/A"
+    return f"{CURRENCY_SYMBOLS.get(currency, '')}{value:.2f}"
+
+
+def format_percent(value):
+    """
+    Format a percentage change for display.
+    :param value: Percentage as a float (NaN if missing).
+    :return: Text such as "3.21%", or "N/A" if the value is missing.
+    """
+    if math.isnan(value):
+        return "N/A"
+    return f"{value:.2f}%"
+
+
+def format_volume(value):
+    """
+    Format a trading volume for display.
+    :param value: Volume as a float (NaN if missing).
+    :return: Text such as "1,234,567", or "N/A" if the value is missing.
+    """
+    if math.isnan(value):
+        return "N/A"
+    return f"{value:,.0f}"
+
+
+def snapshot_arrays(quotes, fields=NUMERIC_FIELDS):
+    """
+    Turn a collection of quotes into a structure-of-arrays snapshot for vectorized processing.
+    :param quotes: Iterable of Quote records.
+    :param fields: Numeric fields to include.
+    :return: Tuple of (list of symbols, dictionary mapping field name to a NumPy float array).
+    """
+    import numpy as np  # Imported here so NumPy is only needed for vectorized work
+
+    quotes = list(quotes)
+    symbols = [quote.symbol for quote in quotes]
+    arrays = {
+        field: np.fromiter((getattr(quote, field) for quote in quotes), dtype=np.float64, count=len(quotes))
+        for field in fields
+    }
+    return symbols, arrays
+
+
+def encode_snapshot(quotes, timestamp=None):
+    """
+    Pack a snapshot into the binary format.
+    :param quotes: Dictionary mapping asset name to Quote.
+    :param timestamp: Time the snapshot was taken (defaults to now).
+    :return: Encoded bytes (without the length prefix).
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    parts = [HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, timestamp, len(quotes))]
+    for name, quote in quotes.items():
+        parts.append(QUOTE.pack(
+            KINDS.index(quote.kind),
+            quote.currency.encode("ascii")[:3].ljust(3),
+            *(getattr(quote, field) for field in NUMERIC_FIELDS),
+        ))
+        for text in (quote.symbol, name):
+            encoded = text.encode("utf-8")
+            parts.append(STRING_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+    return b"".join(parts)
+
+
+def decode_snapshot(payload):
+    """
+    Unpack a snapshot produced by encode_snapshot.
+    :param payload: Encoded bytes.
+    :return: Tuple of (timestamp, dictionary mapping asset name to Quote).
+    """
+    magic, version, timestamp, count = HEADER.unpack_from(payload, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot format ({magic!r} version {version})")
+    offset = HEADER.size
+    quotes = {}
+    for _ in range(count):
+        kind, currency, *values = QUOTE.unpack_from(payload, offset)
+        offset += QUOTE.size
+        texts = []
+        for _ in range(2):
+            (length,) = STRING_LENGTH.unpack_from(payload, offset)
+            offset += STRING_LENGTH.size
+            texts.append(payload[offset:offset + length].decode("utf-8"))
+            offset += length
+        symbol, name = texts
+        quotes[name] = Quote(symbol, name, KINDS[kind], currency.decode("ascii").strip(), *values)
+    return timestamp, quotes
+
+
+def save_snapshot(path, quotes):
+    """
+    Write a snapshot to a file atomically, so a reader never sees a partial file.
+    :param path: File to write.
+    :param quotes: Dictionary mapping asset name to Quote.
+    """
+    with atomic_write(path, binary=True) as file:
+        file.write(encode_snapshot(quotes))
+
+
+def load_snapshot(path):
+    """
+    Read a snapshot written by save_snapshot.
+    :param path: File to read.
+    :return: Tuple of (timestamp, dictionary mapping asset name to Quote), or None if missing or unreadable.
+    """
+    try:
+        with open(path, "rb") as file:
+            return decode_snapshot(file.read())
+    except (OSError, ValueError, struct.error, UnicodeDecodeError, IndexError):
+        return None
@@ -0,0 +1,110 @@
+import json  # Import to send recorded responses
+import time  # Import to simulate latency
+import random  # Import for jitter and error injection
+import argparse  # Import for command-line options
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Import for the local HTTP server
+from urllib.parse import urlsplit, parse_qsl  # Import to rebuild request keys
+
+from providers import load_recordings, request_key  # Import recordings saved by RecordingProvider
+
+"""
+Stand-in API Server
+
+Serves responses recorded by RecordingProvider over local HTTP so the fetch code can be
+measured without a network. Point the fetch code at it with:
+    FETCH_PROVIDER=standin:http://127.0.0.1:8765
+
+Requests arrive as /<scheme>/<host>/<path>?<query> (see providers.standin_url) and are
+answered with the recording for <scheme>://<host>/<path>?<query>. Latency, jitter and
+error injection are configurable so throughput and retry behaviour can be tested reproducibly.
+
+Usage:
+    python standin_server.py recordings/ --port 8765 --latency 80 --jitter 20 --error-rate 0.05
+"""
+
+
+def make_handler(recordings, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None):
+    """
+    Build a request handler class serving the given recordings.
+    :param recordings: Dictionary mapping request key to recorded value.
+    :param latency: Added delay per request in seconds.
+    :param jitter: Maximum extra random delay per request in seconds.
+    :param error_rate: Fraction of requests answered with error_status instead of the recording.
+    :param error_status: HTTP status used for injected errors.
+    :param seed: Optional random seed for reproducible jitter and errors.
+    """
+    rng = random.Random(seed)
+
+    class StandinHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep connections alive like the real APIs
+
+        def do_GET(self):
+            time.sleep(latency + rng.uniform(0, jitter))
+
+            if rng.random() < error_rate:
+                self.send_body(error_status, {"error": "injected error"}, {"Retry-After": "1"})
+                return
+
+            # Rebuild the original URL: /<scheme>/<host>/<path> -> <scheme>://<host>/<path>
+            parts = urlsplit(self.path)
+            scheme, _, rest = parts.path.lstrip("/").partition("/")
+            key = request_key(f"{scheme}://{rest}", dict(parse_qsl(parts.query)))
+            if key in recordings:
+                self.send_body(200, recordings[key])
+            else:
+                self.send_body(404, {"error": f"no recording for {key}"})
+
+        def send_body(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+    return StandinHandler
+
+
+def start_server(recordings, host="127.0.0.1", port=0, **options):
+    """
+    Create a stand-in server (not yet serving).
+    :param recordings: Dictionary mapping request key to recorded value.
+    :param host: Address to bind to.
+    :param port: Port to bind to (0 picks a free port).
+    :param options: Latency and error options passed to make_handler.
+    :return: ThreadingHTTPServer; call serve_forever() on it (e.g. from a thread).
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(recordings, **options))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded API responses locally.")
+    parser.add_argument("directory", help="Folder of recordings saved by RecordingProvider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0, help="Added delay per request in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="Maximum extra random delay in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    server = start_server(
+        load_recordings(args.directory),
+        host=args.host,
+        port=args.port,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    print(f"Serving {args.directory} on http://{args.host}:{server.server_port}")
+    server.serve_forever()
@@ -0,0 +1,35 @@
+import os  # Import for paths
+import sys  # Import to make the project modules importable
+import unittest  # Import for the test case
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["FETCH_CACHE_DIR"] = ""  # Keep responses from other runs out of the test
+os.environ["FETCH_BUDGET_FILE"] = ""  # Do not draw on the budget of running dashboards
+
+import providers  # Import to swap in an offline provider
+import fetch_daemon  # Import the daemon under test
+from quote_cache import quote_cache  # Import to clear cached responses between tests
+from alert_engine import load_rules, RULES_PATH  # Import the shipped alert rules
+
+
+class DaemonSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        providers.set_provider(providers.SyntheticProvider())
+        quote_cache.clear()
+
+    def tearDown(self):
+        providers.set_provider(None)
+
+    def test_every_rule_asset_reaches_the_snapshot(self):
+        scheduler = fetch_daemon.make_scheduler(budget_per_minute=600)
+        snapshot = {}
+        fetch_daemon.refresh(scheduler, snapshot)
+
+        symbols = {quote.symbol for quote in snapshot.values()}
+        for rule in load_rules(RULES_PATH):
+            self.assertIn(rule["asset"], symbols)
+
+
+if __name__ == "__main__":
+    unittest.main()
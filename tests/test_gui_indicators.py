@@ -0,0 +1,65 @@
+import os  # Import for paths and settings
+import sys  # Import to make the project modules importable
+import types  # Import for a stand-in dashboard
+import tempfile  # Import for a throwaway time-series database
+import unittest  # Import for the test case
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TEMP_DIR = tempfile.mkdtemp()
+os.environ["FETCH_CACHE_DIR"] = ""  # Keep responses from other runs out of the test
+os.environ["FETCH_TIMESERIES_DB"] = os.path.join(TEMP_DIR, "timeseries.db")
+
+import providers  # Import to swap in an offline provider
+import crypto_charts  # Import the chart code that fills the price history
+import gui_display  # Import the dashboard under test
+from fx import DISPLAY_CURRENCY  # Import the currency the history is stored in
+from quotes import Quote  # Import typed quote records
+
+# Exchange rates as CoinGecko reports them (value of 1 BTC)
+RATES = {"btc": 1.0, "usd": 60000.0, "gbp": 48000.0, "eur": 54000.0, "jpy": 9000000.0}
+
+
+class FallingChartProvider:
+    """Serves an hourly price history that falls steadily from 200 to 100."""
+
+    def get_json(self, url, params=None, timeout=10):
+        start, end = params["from"] * 1000, params["to"] * 1000
+        step = 60 * 60 * 1000
+        count = max(2, (end - start) // step)
+        return {"prices": [[start + i * step, 200.0 - 100.0 * i / (count - 1)] for i in range(count)]}
+
+
+class UpdateIndicatorsTest(unittest.TestCase):
+    def setUp(self):
+        providers.set_provider(FallingChartProvider())
+
+    def tearDown(self):
+        providers.set_provider(None)
+
+    def test_seeds_from_the_history_the_charts_store(self):
+        crypto_charts.chart_series("bitcoin", days=2, currency=DISPLAY_CURRENCY)
+        stored = crypto_charts.get_store().query("bitcoin", DISPLAY_CURRENCY)
+        dashboard = types.SimpleNamespace(indicators={}, history=crypto_charts.get_store(), rates=RATES)
+
+        # Live quotes arrive in the base currency; this one is 90 in the display currency
+        price = 90 * RATES["usd"] / RATES[DISPLAY_CURRENCY]
+        quote = Quote(symbol="bitcoin", name="Bitcoin", kind="crypto", currency="usd", price=price)
+        drawdowns = gui_display.CryptoDashboard.update_indicators(dashboard, {"Bitcoin": quote})
+
+        state = dashboard.indicators["Bitcoin"]
+        self.assertEqual(len(state.prices), len(stored) + 1)
+        self.assertAlmostEqual(drawdowns["Bitcoin"], 90 / 200 - 1)
+
+    def test_skips_live_prices_without_exchange_rates(self):
+        crypto_charts.chart_series("ethereum", days=2, currency=DISPLAY_CURRENCY)
+        dashboard = types.SimpleNamespace(indicators={}, history=crypto_charts.get_store(), rates=None)
+
+        quote = Quote(symbol="ethereum", name="Ethereum", kind="crypto", currency="usd", price=1000.0)
+        drawdowns = gui_display.CryptoDashboard.update_indicators(dashboard, {"Ethereum": quote})
+
+        self.assertAlmostEqual(drawdowns["Ethereum"], 100 / 200 - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
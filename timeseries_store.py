@@ -0,0 +1,104 @@
+import os  # Import for the default database location
+import sqlite3  # Import SQLite for the local time-series store
+import threading  # Import to share one connection safely between threads
+
+"""
+Time-Series Store
+
+A local append-only store of historical prices, one series per coin and currency, kept in SQLite.
+Alongside the points it records which time range has already been downloaded, so callers only
+need to fetch data before the first covered timestamp or after the last one.
+All timestamps are milliseconds since the Unix epoch, as returned by CoinGecko.
+"""
+
+# Default database file; set FETCH_TIMESERIES_DB to use another location
+DB_PATH = os.environ.get(
+    "FETCH_TIMESERIES_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "timeseries.db")
+)
+
+
+class TimeSeriesStore:
+    def __init__(self, path=DB_PATH):
+        """
+        :param path: Path of the SQLite database file (created if missing).
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")  # Let other processes read while we write
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS prices (
+                    coin TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    price REAL NOT NULL,
+                    PRIMARY KEY (coin, currency, ts)
+                ) WITHOUT ROWID
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS coverage (
+                    coin TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    covered_from INTEGER NOT NULL,
+                    covered_to INTEGER NOT NULL,
+                    PRIMARY KEY (coin, currency)
+                )
+                """
+            )
+
+    def coverage(self, coin, currency):
+        """
+        Get the time range that has already been downloaded for a series.
+        :return: Tuple of (covered_from, covered_to) in milliseconds, or None if nothing is stored.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT covered_from, covered_to FROM coverage WHERE coin = ? AND currency = ?",
+                (coin, currency),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def append(self, coin, currency, points, covered_from, covered_to):
+        """
+        Merge new points into a series and extend its covered range.
+        :param coin: CoinGecko coin ID.
+        :param currency: Currency code (e.g. "gbp").
+        :param points: Iterable of (timestamp_ms, price) pairs; existing timestamps are overwritten.
+        :param covered_from: Start of the range the points were downloaded for (milliseconds).
+        :param covered_to: End of the range the points were downloaded for (milliseconds).
+        """
+        rows = [(coin, currency, int(ts), float(price)) for ts, price in points if price is not None]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute(
+                """
+                INSERT INTO coverage VALUES (?, ?, ?, ?)
+                ON CONFLICT (coin, currency) DO UPDATE SET
+                    covered_from = MIN(covered_from, excluded.covered_from),
+                    covered_to = MAX(covered_to, excluded.covered_to)
+                """,
+                (coin, currency, int(covered_from), int(covered_to)),
+            )
+
+    def query(self, coin, currency, start=None, end=None):
+        """
+        Read a range of a series from disk.
+        :param coin: CoinGecko coin ID.
+        :param currency: Currency code (e.g. "gbp").
+        :param start: Optional start timestamp in milliseconds (inclusive).
+        :param end: Optional end timestamp in milliseconds (inclusive).
+        :return: List of (timestamp_ms, price) pairs in time order.
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT ts, price FROM prices WHERE coin = ? AND currency = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+                (coin, currency, start if start is not None else 0, end if end is not None else 2 ** 62),
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
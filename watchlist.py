@@ -0,0 +1,64 @@
+import os  # Import for the config path and the FETCH_WATCHLIST setting
+import json  # Import to load the watchlist config file
+
+"""
+Watchlist
+
+The assets tracked by the dashboard, the fetch daemon, the alerter and the charts, loaded from
+watchlist.json (or the file named by the FETCH_WATCHLIST environment variable):
+    {
+      "crypto": {"bitcoin": "Bitcoin", ...},      CoinGecko ID -> display name
+      "stocks": {"Tesla": "TSLA", ...},           display name -> Yahoo Finance ticker
+      "charts": {"ethereum": "Ethereum", ...}     coins charted by crypto_charts.py (defaults to "crypto")
+    }
+
+chunk_ids() splits long ID lists so each CoinGecko request stays within the API's ID limit
+and a safe URL length; fetch_prices fetches the chunks in parallel and merges them.
+"""
+
+WATCHLIST_PATH = os.environ.get(
+    "FETCH_WATCHLIST", os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlist.json")
+)
+# Most IDs sent in one CoinGecko request
+MAX_IDS_PER_REQUEST = 250
+# Longest comma-joined ids parameter sent in one request, keeping the whole URL well under 2,000 characters
+MAX_IDS_LENGTH = 1500
+
+
+def load_watchlist(path=None):
+    """
+    Load the watchlist config file.
+    :param path: Path of the JSON file (defaults to WATCHLIST_PATH).
+    :return: Dictionary with "crypto" ({id: name}), "stocks" ({name: ticker}) and "charts" ({id: name}).
+    """
+    with open(path or WATCHLIST_PATH, "r", encoding="utf-8") as file:
+        config = json.load(file)
+    crypto = config.get("crypto", {})
+    return {
+        "crypto": crypto,
+        "stocks": config.get("stocks", {}),
+        "charts": config.get("charts", crypto),
+    }
+
+
+def chunk_ids(ids, max_ids=MAX_IDS_PER_REQUEST, max_length=MAX_IDS_LENGTH):
+    """
+    Split IDs into chunks small enough for one request each.
+    :param ids: Iterable of IDs.
+    :param max_ids: Most IDs per chunk.
+    :param max_length: Longest comma-joined length of a chunk.
+    :return: List of lists of IDs, in the original order.
+    """
+    chunks = []
+    current = []
+    length = 0
+    for coin_id in ids:
+        added = len(coin_id) + (1 if current else 0)  # Account for the joining comma
+        if current and (len(current) >= max_ids or length + added > max_length):
+            chunks.append(current)
+            current, length, added = [], 0, len(coin_id)
+        current.append(coin_id)
+        length += added
+    if current:
+        chunks.append(current)
+    return chunks